@@ -0,0 +1,416 @@
+#!/usr/bin/env python3
+"""
+多节点批量排盘
+协调器把输入文件按行切成分片，通过TCP（multiprocessing.managers）分发给工作进程；
+工作进程逐行调用 BaZiResult.from_solar 并把分片结果传回，协调器写出分片文件、
+跟踪进度、重试失败或超时的分片，最后按顺序合并
+长时间没有工作进程领取分片（--idle-timeout），或本机工作进程全部退出时，
+剩余分片记为失败并返回非零，不会无限等待
+
+用法：
+    # 协调器（--local-workers 在本机启动若干工作进程，便于端到端测试）
+    python batch_cluster.py coordinator input.csv --output result.csv --bind 0.0.0.0:50000 --authkey secret
+    # 其他机器上的工作进程
+    python batch_cluster.py worker 协调器地址:50000 --authkey secret
+
+连接基于pickle，能通过认证的客户端即可在协调器上执行代码：
+协调器未指定 --authkey 时生成随机密钥并打印，工作进程必须提供同一密钥；
+对外只暴露 get_task/complete/fail 三个方法
+"""
+import argparse
+import csv
+import io
+import os
+import secrets
+import socket
+import sys
+import threading
+import time
+from dataclasses import dataclass
+from multiprocessing import Process
+from multiprocessing.managers import BaseManager
+from typing import Dict, List, Optional, Tuple
+
+from bazi import BaZiResult
+from chart_cache import parse_input_row
+
+
+OUTPUT_HEADER = ['year', 'month', 'day', 'hour', 'gender',
+                 'year_pillar', 'month_pillar', 'day_pillar', 'hour_pillar',
+                 'xun_kong', 'da_yun_direction', 'error']
+
+# 输入表头的首列（出现时跳过该行）
+INPUT_HEADER_FIELDS = ('year', '年')
+
+# 工作进程可调用的协调器方法
+EXPOSED_METHODS = ('get_task', 'complete', 'fail')
+
+# 工作进程无分片可领时的轮询间隔（秒）
+WORKER_POLL_SECONDS = 0.5
+
+# 分片状态
+PENDING = 'pending'
+RUNNING = 'running'
+DONE = 'done'
+FAILED = 'failed'
+
+
+# ==================== 分片 ====================
+
+@dataclass
+class Shard:
+    """输入文件中的一段行，[start, end) 为字节偏移"""
+    shard_id: int
+    path: str
+    start: int
+    end: int
+    state: str = PENDING
+    attempts: int = 0
+    deadline: float = 0.0
+    worker: str = ''
+    rows: int = 0
+    error: str = ''
+
+
+def split_file(path: str, shard_size: int, first_id: int = 0) -> List[Shard]:
+    """按 shard_size 行切分文件（只记录偏移，不把内容读入内存）"""
+    shards = []
+    with open(path, 'rb') as f:
+        start = 0
+        count = 0
+        offset = 0
+        for line in f:
+            offset += len(line)
+            count += 1
+            if count == shard_size:
+                shards.append(Shard(first_id + len(shards), path, start, offset))
+                start = offset
+                count = 0
+        if count:
+            shards.append(Shard(first_id + len(shards), path, start, offset))
+    return shards
+
+
+def chart_rows(text: str) -> Tuple[str, int]:
+    """
+    对一个分片的输入文本逐行排盘，返回 (输出CSV文本, 行数)
+    跳过空行、#开头的注释行和表头行（首列为 year/年）；
+    无法解析的行原样保留前5列，错误信息写入 error 列
+    """
+    out = io.StringIO()
+    writer = csv.writer(out, lineterminator='\n')
+    rows = 0
+    for row in csv.reader(io.StringIO(text)):
+        if not row or row[0].startswith('#') or row[0].strip().lower() in INPUT_HEADER_FIELDS:
+            continue
+        rows += 1
+        try:
+            case = parse_input_row(row)
+            result = BaZiResult.from_solar(*case)
+        except (ValueError, IndexError) as e:
+            writer.writerow((row + [''] * 5)[:5] + [''] * 6 + [str(e)])
+            continue
+        bazi = result.ba_zi
+        writer.writerow([
+            *case[:4], '男' if case[4] else '女',
+            str(bazi.year), str(bazi.month), str(bazi.day), str(bazi.hour),
+            bazi.xun_kong_1 + bazi.xun_kong_2,
+            '顺' if result.da_yun_system.shun_pai else '逆',
+            ''
+        ])
+    return out.getvalue(), rows
+
+
+# ==================== 协调器 ====================
+
+class Coordinator:
+    """分片调度状态，方法由管理器服务线程调用，内部加锁"""
+
+    def __init__(self, shards: List[Shard], out_dir: str,
+                 max_retries: int = 3, lease_seconds: float = 300.0):
+        self.shards: Dict[int, Shard] = {s.shard_id: s for s in shards}
+        self.out_dir = out_dir
+        self.max_retries = max_retries
+        self.lease_seconds = lease_seconds
+        self._lock = threading.Lock()
+        # 最近一次工作进程调用的时间，用于判断是否已无工作进程
+        self._last_seen = time.time()
+        os.makedirs(out_dir, exist_ok=True)
+
+    def shard_path(self, shard_id: int) -> str:
+        return os.path.join(self.out_dir, f"shard_{shard_id:06d}.csv")
+
+    # ---------- 供工作进程调用 ----------
+
+    def get_task(self, worker: str) -> dict:
+        """
+        领取一个分片
+        返回 {'status': 'task', 'shard_id', 'text'}，
+        暂无可领分片时为 {'status': 'wait'}，全部结束时为 {'status': 'done'}
+        """
+        with self._lock:
+            now = time.time()
+            self._last_seen = now
+            self._reclaim_expired(now)
+            shard = next((s for s in self.shards.values() if s.state == PENDING), None)
+            if shard is None:
+                finished = all(s.state in (DONE, FAILED) for s in self.shards.values())
+                return {'status': 'done' if finished else 'wait'}
+            shard.state = RUNNING
+            shard.attempts += 1
+            shard.deadline = now + self.lease_seconds
+            shard.worker = worker
+
+        with open(shard.path, 'rb') as f:
+            f.seek(shard.start)
+            text = f.read(shard.end - shard.start).decode('utf-8')
+        return {'status': 'task', 'shard_id': shard.shard_id, 'text': text}
+
+    def complete(self, worker: str, shard_id: int, output: str, rows: int) -> bool:
+        """提交分片结果，重复或过期的提交返回False"""
+        with self._lock:
+            self._last_seen = time.time()
+            shard = self.shards[shard_id]
+            if shard.state != RUNNING or shard.worker != worker:
+                return False
+            path = self.shard_path(shard_id)
+            tmp = path + '.tmp'
+            with open(tmp, 'w', encoding='utf-8', newline='') as f:
+                f.write(output)
+            os.replace(tmp, path)
+            shard.state = DONE
+            shard.rows = rows
+            return True
+
+    def fail(self, worker: str, shard_id: int, error: str) -> None:
+        """报告分片处理失败"""
+        with self._lock:
+            self._last_seen = time.time()
+            shard = self.shards[shard_id]
+            if shard.state == RUNNING and shard.worker == worker:
+                self._record_failure(shard, error)
+
+    def _reclaim_expired(self, now: float) -> None:
+        """回收租约过期的分片（工作进程失联），视为一次失败；调用方需持有锁"""
+        for s in self.shards.values():
+            if s.state == RUNNING and s.deadline < now:
+                self._record_failure(s, f"租约超时（{s.worker}）")
+
+    def _record_failure(self, shard: Shard, error: str) -> None:
+        shard.error = error
+        shard.worker = ''
+        shard.state = FAILED if shard.attempts > self.max_retries else PENDING
+
+    # ---------- 进度 ----------
+
+    def progress(self) -> Dict[str, int]:
+        """各状态分片数和已完成行数（同时回收过期租约，保证全部工作进程退出后也能结束）"""
+        with self._lock:
+            self._reclaim_expired(time.time())
+            counts = {PENDING: 0, RUNNING: 0, DONE: 0, FAILED: 0, 'rows': 0}
+            for s in self.shards.values():
+                counts[s.state] += 1
+                counts['rows'] += s.rows
+            return counts
+
+    def finished(self) -> bool:
+        progress = self.progress()
+        return progress[PENDING] == 0 and progress[RUNNING] == 0
+
+    def idle_seconds(self) -> float:
+        """没有分片在处理时，距最近一次工作进程调用的秒数；有分片在处理时为0"""
+        with self._lock:
+            now = time.time()
+            self._reclaim_expired(now)
+            if any(s.state == RUNNING for s in self.shards.values()):
+                return 0.0
+            return now - self._last_seen
+
+    def abandon(self, reason: str) -> int:
+        """把未完成的分片全部记为失败（已无工作进程可用），返回分片数"""
+        with self._lock:
+            count = 0
+            for s in self.shards.values():
+                if s.state in (PENDING, RUNNING):
+                    s.state = FAILED
+                    s.worker = ''
+                    s.error = reason
+                    count += 1
+            return count
+
+    def failed_shards(self) -> List[Shard]:
+        with self._lock:
+            return [s for s in self.shards.values() if s.state == FAILED]
+
+    def merge(self, output: str) -> int:
+        """按分片顺序合并结果，返回行数"""
+        rows = 0
+        with open(output, 'w', encoding='utf-8', newline='') as out:
+            out.write(','.join(OUTPUT_HEADER) + '\n')
+            for shard_id in sorted(self.shards):
+                with open(self.shard_path(shard_id), encoding='utf-8', newline='') as f:
+                    for line in f:
+                        out.write(line)
+                        rows += 1
+        return rows
+
+
+# ==================== 管理器 ====================
+
+class ClusterClient(BaseManager):
+    """工作进程端的管理器（服务端每次 serve 使用独立的子类，互不覆盖注册表）"""
+
+
+ClusterClient.register('coordinator')
+
+
+def serve(coordinator: Coordinator, address: Tuple[str, int], authkey: bytes):
+    """在后台线程中提供协调器服务（只暴露 EXPOSED_METHODS），返回实际监听地址"""
+    class ClusterServer(BaseManager):
+        pass
+
+    ClusterServer.register('coordinator', callable=lambda: coordinator, exposed=EXPOSED_METHODS)
+    manager = ClusterServer(address=address, authkey=authkey)
+    server = manager.get_server()
+    thread = threading.Thread(target=server.serve_forever, daemon=True)
+    thread.start()
+    return server.address
+
+
+def run_worker(address: Tuple[str, int], authkey: bytes, name: Optional[str] = None,
+               poll_seconds: float = WORKER_POLL_SECONDS) -> int:
+    """工作进程主循环，返回处理的分片数"""
+    manager = ClusterClient(address=address, authkey=authkey)
+    manager.connect()
+    coordinator = manager.coordinator()
+    name = name or f"{socket.gethostname()}:{os.getpid()}"
+
+    processed = 0
+    while True:
+        task = coordinator.get_task(name)
+        if task['status'] == 'done':
+            return processed
+        if task['status'] == 'wait':
+            time.sleep(poll_seconds)
+            continue
+        try:
+            output, rows = chart_rows(task['text'])
+        except Exception as e:
+            coordinator.fail(name, task['shard_id'], repr(e))
+            continue
+        coordinator.complete(name, task['shard_id'], output, rows)
+        processed += 1
+
+
+def run_coordinator(inputs: List[str], output: str, out_dir: str,
+                    address: Tuple[str, int], authkey: bytes,
+                    shard_size: int = 100000, local_workers: int = 0,
+                    max_retries: int = 3, lease_seconds: float = 300.0,
+                    report_seconds: float = 5.0, idle_timeout: float = 600.0) -> int:
+    """运行协调器直到所有分片结束，返回退出码"""
+    shards = []
+    for path in inputs:
+        shards.extend(split_file(path, shard_size, len(shards)))
+    coordinator = Coordinator(shards, out_dir, max_retries, lease_seconds)
+    bound = serve(coordinator, address, authkey)
+    print(f"协调器监听 {bound[0]}:{bound[1]}，共 {len(shards)} 个分片", file=sys.stderr)
+
+    host = '127.0.0.1' if bound[0] in ('', '0.0.0.0') else bound[0]
+    workers = [
+        Process(target=run_worker, args=((host, bound[1]), authkey, f"local-{i}"), daemon=True)
+        for i in range(local_workers)
+    ]
+    for p in workers:
+        p.start()
+
+    began = time.perf_counter()
+    wait_for_shards(coordinator, workers, idle_timeout, report_seconds)
+    for p in workers:
+        p.join(timeout=10)
+
+    failed = coordinator.failed_shards()
+    if failed:
+        print(f"❌ {len(failed)} 个分片失败，未合并：", file=sys.stderr)
+        for s in failed:
+            print(f"  分片 {s.shard_id}（{s.path} 字节 {s.start}-{s.end}）：{s.error}", file=sys.stderr)
+        return 1
+
+    rows = coordinator.merge(output)
+    seconds = time.perf_counter() - began
+    print(f"✅ 已合并 {rows} 行到 {output}，耗时 {seconds:.1f}秒", file=sys.stderr)
+    return 0
+
+
+def wait_for_shards(coordinator: Coordinator, workers: List[Process],
+                    idle_timeout: float, report_seconds: float = 5.0) -> None:
+    """
+    等待所有分片结束
+    本机工作进程全部退出、或无工作进程调用超过 idle_timeout 秒时，剩余分片记为失败
+    """
+    began = time.perf_counter()
+    last_report = began
+    while not coordinator.finished():
+        time.sleep(0.2)
+        idle = coordinator.idle_seconds()
+        # 留出几个轮询间隔，避免把正在领取分片的其他机器上的工作进程误判为不存在
+        if workers and not any(p.is_alive() for p in workers) and idle >= WORKER_POLL_SECONDS * 4:
+            coordinator.abandon("本机工作进程已全部退出")
+        elif idle >= idle_timeout:
+            coordinator.abandon(f"超过 {idle_timeout:.0f} 秒没有工作进程")
+        if time.perf_counter() - last_report >= report_seconds:
+            last_report = time.perf_counter()
+            p = coordinator.progress()
+            rate = p['rows'] / (last_report - began)
+            print(f"进度: {p[DONE]}/{len(coordinator.shards)} 分片完成，{p[RUNNING]} 处理中，"
+                  f"{p[FAILED]} 失败，{rate:.0f} 行/秒", file=sys.stderr)
+
+
+# ==================== 命令行 ====================
+
+def _parse_address(text: str) -> Tuple[str, int]:
+    host, _, port = text.rpartition(':')
+    return (host, int(port))
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="多节点批量排盘")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_coord = sub.add_parser('coordinator', help="切分输入并调度工作进程")
+    p_coord.add_argument('inputs', nargs='+', help="输入CSV：年,月,日,时,性别")
+    p_coord.add_argument('--output', required=True, help="合并后的输出文件")
+    p_coord.add_argument('--shard-dir', default=None, help="分片结果目录（默认 输出文件名.shards）")
+    p_coord.add_argument('--bind', default='127.0.0.1:0', help="监听地址 host:port（端口0为自动分配）")
+    p_coord.add_argument('--authkey', default=None, help="连接认证密钥（默认生成随机密钥并打印）")
+    p_coord.add_argument('--shard-size', type=int, default=100000, help="每个分片的行数")
+    p_coord.add_argument('--local-workers', type=int, default=0, help="在本机启动的工作进程数")
+    p_coord.add_argument('--max-retries', type=int, default=3, help="每个分片的最大重试次数")
+    p_coord.add_argument('--lease', type=float, default=300.0, help="分片租约秒数，超时后重新分配")
+    p_coord.add_argument('--idle-timeout', type=float, default=600.0,
+                         help="超过此秒数没有工作进程时放弃剩余分片")
+
+    p_worker = sub.add_parser('worker', help="连接协调器并处理分片")
+    p_worker.add_argument('address', help="协调器地址 host:port")
+    p_worker.add_argument('--authkey', required=True, help="连接认证密钥（与协调器相同）")
+    p_worker.add_argument('--name', default=None, help="工作进程名（默认 主机名:进程号）")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'coordinator':
+        if args.authkey is None:
+            args.authkey = secrets.token_hex(16)
+            print(f"认证密钥: {args.authkey}（工作进程使用 --authkey 传入）", file=sys.stderr)
+        authkey = args.authkey.encode('utf-8')
+        return run_coordinator(
+            args.inputs, args.output, args.shard_dir or args.output + '.shards',
+            _parse_address(args.bind), authkey, args.shard_size, args.local_workers,
+            args.max_retries, args.lease, idle_timeout=args.idle_timeout
+        )
+
+    processed = run_worker(_parse_address(args.address), args.authkey.encode('utf-8'), args.name)
+    print(f"已处理 {processed} 个分片", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -2,16 +2,34 @@
 八字系统主模块
 实现八字排盘、大运、流年等功能
 """
-from typing import List, Tuple, Optional
+from typing import Dict, List, Tuple, Optional
 from dataclasses import dataclass
-from datetime import datetime
+from datetime import datetime, timedelta
 from ganzhi import (
     TianGan, DiZhi, ShiShen,
     gan_to_zh, zhi_to_zh, shi_shen_to_zh,
     get_shi_shen, get_cang_gan, get_xun_kong,
     get_gan_yin_yang, YinYang
 )
-from lunarcal import calculate_bazi, jiazi_from_index, get_sixty_jiazi_index
+from lunarcal import (
+    calculate_bazi, jiazi_from_index, get_sixty_jiazi_index, lunar_to_solar,
+    get_hour_pillar, hour_to_shichen, SHICHEN_HOURS
+)
+
+
+# ==================== 四柱查表 ====================
+
+# 预计算四柱表（见 pillar_table.py），为None时始终走计算路径
+_pillar_table = None
+
+
+def use_pillar_table(table) -> None:
+    """
+    启用预计算四柱表，传入 pillar_table.PillarTable 或 None（关闭）
+    启用后 BaZi.from_solar 在表范围内直接查表，范围外回退到计算
+    """
+    global _pillar_table
+    _pillar_table = table
 
 
 # ==================== 数据结构 ====================
@@ -28,6 +46,15 @@ class Pillar:
     @classmethod
     def from_tuple(cls, t: Tuple[TianGan, DiZhi]):
         return cls(gan=t[0], zhi=t[1])
+    
+    @property
+    def jiazi_index(self) -> int:
+        """六十甲子索引（0-59）"""
+        return get_sixty_jiazi_index(self.gan, self.zhi)
+    
+    @classmethod
+    def from_jiazi_index(cls, index: int):
+        return cls.from_tuple(jiazi_from_index(index))
 
 
 @dataclass
@@ -43,7 +70,11 @@ class BaZi:
     @classmethod
     def from_solar(cls, year: int, month: int, day: int, hour: int):
         """从公历创建八字"""
-        bazi_data = calculate_bazi(year, month, day, hour)
+        bazi_data = None
+        if _pillar_table is not None:
+            bazi_data = _pillar_table.lookup(year, month, day, hour)
+        if bazi_data is None:
+            bazi_data = calculate_bazi(year, month, day, hour)
         
         year_pillar = Pillar.from_tuple(bazi_data['year'])
         month_pillar = Pillar.from_tuple(bazi_data['month'])
@@ -61,6 +92,10 @@ class BaZi:
             xun_kong_1=zhi_to_zh(kong1),
             xun_kong_2=zhi_to_zh(kong2)
         )
+    
+    def pack(self) -> bytes:
+        """打包为4字节：年、月、日、时柱的六十甲子索引"""
+        return bytes(p.jiazi_index for p in (self.year, self.month, self.day, self.hour))
 
 
 @dataclass
@@ -97,8 +132,54 @@ class LiuNian:
 
 # ==================== 大运系统 ====================
 
+# 大运步数
+DA_YUN_COUNT = 10
+
+# 大运干支和十神只取决于月柱、排运方向和日干（60 x 2 x 10 种组合），
+# 各盘共享同一份序列：(月柱六十甲子索引, 是否顺排, 日干) -> ((天干, 地支, 天干十神, 地支十神), ...)
+_da_yun_sequences: Dict[Tuple[int, bool, int], Tuple[Tuple[TianGan, DiZhi, ShiShen, ShiShen], ...]] = {}
+
+
+def get_da_yun_sequence(month: Pillar, shun_pai: bool, day_gan: TianGan):
+    """获取共享的大运序列（首次使用时生成）"""
+    key = (month.jiazi_index, shun_pai, int(day_gan))
+    sequence = _da_yun_sequences.get(key)
+    if sequence is not None:
+        return sequence
+    
+    result = []
+    
+    # 从月柱开始推算
+    current_gan = month.gan
+    current_zhi = month.zhi
+    
+    for i in range(DA_YUN_COUNT):
+        # 前进或后退一柱
+        if shun_pai:
+            # 顺排：干支都加1
+            current_gan = TianGan((current_gan + 1) % 10)
+            current_zhi = DiZhi((current_zhi + 1) % 12)
+        else:
+            # 逆排：干支都减1
+            current_gan = TianGan((current_gan + 9) % 10)
+            current_zhi = DiZhi((current_zhi + 11) % 12)
+        
+        # 计算十神
+        gan_shi_shen = get_shi_shen(day_gan, current_gan)
+        cang_gan = get_cang_gan(current_zhi)
+        zhi_shi_shen = get_shi_shen(day_gan, cang_gan[0])
+        
+        result.append((current_gan, current_zhi, gan_shi_shen, zhi_shi_shen))
+    
+    sequence = tuple(result)
+    _da_yun_sequences[key] = sequence
+    return sequence
+
+
 class DaYunSystem:
-    """大运系统"""
+    """大运系统（大运序列共享，每盘只保存起运年龄和出生年，DaYun 按需生成）"""
+    
+    __slots__ = ('bazi', 'is_male', 'birth_year', 'shun_pai', 'qi_yun_age', '_sequence')
     
     def __init__(self, bazi: BaZi, is_male: bool, birth_year: int):
         self.bazi = bazi
@@ -114,60 +195,49 @@ class DaYunSystem:
         # 起运年龄（简化：固定为3岁，实际应根据节气计算）
         self.qi_yun_age = 3
         
-        # 生成大运列表
-        self.da_yun_list = self._generate_da_yun_list(10)
+        # 共享的大运序列
+        self._sequence = get_da_yun_sequence(bazi.month, self.shun_pai, bazi.day.gan)
     
-    def _generate_da_yun_list(self, count: int) -> List[DaYun]:
-        """生成大运列表"""
-        result = []
-        
-        # 从月柱开始推算
-        current_gan = self.bazi.month.gan
-        current_zhi = self.bazi.month.zhi
-        
-        current_age = self.qi_yun_age
-        current_year = self.birth_year + self.qi_yun_age
-        
-        for i in range(count):
-            # 前进或后退一柱
-            if self.shun_pai:
-                # 顺排：干支都加1
-                current_gan = TianGan((current_gan + 1) % 10)
-                current_zhi = DiZhi((current_zhi + 1) % 12)
-            else:
-                # 逆排：干支都减1
-                current_gan = TianGan((current_gan + 9) % 10)
-                current_zhi = DiZhi((current_zhi + 11) % 12)
-            
-            pillar = Pillar(current_gan, current_zhi)
-            
-            # 计算十神
-            gan_shi_shen = get_shi_shen(self.bazi.day.gan, current_gan)
-            cang_gan = get_cang_gan(current_zhi)
-            zhi_shi_shen = get_shi_shen(self.bazi.day.gan, cang_gan[0])
-            
-            da_yun = DaYun(
-                pillar=pillar,
-                start_age=current_age,
-                end_age=current_age + 9,
-                start_year=current_year,
-                end_year=current_year + 9,
-                gan_shi_shen=gan_shi_shen,
-                zhi_shi_shen=zhi_shi_shen
-            )
-            
-            result.append(da_yun)
-            
-            current_age += 10
-            current_year += 10
-        
-        return result
+    @classmethod
+    def restore(cls, bazi: BaZi, is_male: bool, birth_year: int,
+                shun_pai: bool, qi_yun_age: int):
+        """从已保存的数据恢复大运系统（不重新判断排运方向）"""
+        system = cls.__new__(cls)
+        system.bazi = bazi
+        system.is_male = is_male
+        system.birth_year = birth_year
+        system.shun_pai = shun_pai
+        system.qi_yun_age = qi_yun_age
+        system._sequence = get_da_yun_sequence(bazi.month, shun_pai, bazi.day.gan)
+        return system
+    
+    def _da_yun(self, index: int) -> DaYun:
+        """生成第 index 步大运"""
+        gan, zhi, gan_shi_shen, zhi_shi_shen = self._sequence[index]
+        start_age = self.qi_yun_age + index * 10
+        start_year = self.birth_year + start_age
+        return DaYun(
+            pillar=Pillar(gan, zhi),
+            start_age=start_age,
+            end_age=start_age + 9,
+            start_year=start_year,
+            end_year=start_year + 9,
+            gan_shi_shen=gan_shi_shen,
+            zhi_shi_shen=zhi_shi_shen
+        )
+    
+    @property
+    def da_yun_list(self) -> List[DaYun]:
+        """大运列表"""
+        return [self._da_yun(i) for i in range(len(self._sequence))]
     
     def get_da_yun_by_age(self, age: int) -> Optional[DaYun]:
         """根据年龄获取当前大运"""
-        for da_yun in self.da_yun_list:
-            if da_yun.contains_age(age):
-                return da_yun
+        if age < self.qi_yun_age:
+            return None
+        index = (age - self.qi_yun_age) // 10
+        if index < len(self._sequence):
+            return self._da_yun(index)
         return None
 
 
@@ -225,6 +295,60 @@ class BaZiResult:
             da_yun_system=da_yun_system
         )
     
+    @classmethod
+    def from_solar_all_hours(cls, year: int, month: int, day: int, is_male: bool) -> 'AllHoursResult':
+        """
+        时辰未知时一次排出全部时辰的候选盘
+        前12个为当日子时（0点）到亥时：年、月、日柱、旬空和大运方向只算一次，时柱按五鼠遁由日干推出。
+        第13个为23点出生（晚子时）：按本库约定算次日子时，即按次日日期排盘，
+        跨立春或节气时年柱、月柱也可能不同
+        """
+        bazi_data = calculate_bazi(year, month, day, SHICHEN_HOURS[0])
+        year_pillar = bazi_data['year']
+        month_pillar = bazi_data['month']
+        day_pillar = bazi_data['day']
+        kong1, kong2 = get_xun_kong(*day_pillar)
+        xun_kong_1 = zhi_to_zh(kong1)
+        xun_kong_2 = zhi_to_zh(kong2)
+        
+        candidates = []
+        shun_pai = None
+        for hour in SHICHEN_HOURS:
+            ba_zi = BaZi(
+                year=Pillar.from_tuple(year_pillar),
+                month=Pillar.from_tuple(month_pillar),
+                day=Pillar.from_tuple(day_pillar),
+                hour=Pillar.from_tuple(get_hour_pillar(day_pillar[0], hour)),
+                xun_kong_1=xun_kong_1,
+                xun_kong_2=xun_kong_2
+            )
+            if shun_pai is None:
+                da_yun_system = DaYunSystem(ba_zi, is_male, year)
+                shun_pai = da_yun_system.shun_pai
+                qi_yun_age = da_yun_system.qi_yun_age
+            else:
+                da_yun_system = DaYunSystem.restore(ba_zi, is_male, year, shun_pai, qi_yun_age)
+            candidates.append(cls(
+                ba_zi=ba_zi,
+                is_male=is_male,
+                birth_year=year,
+                birth_month=month,
+                birth_day=day,
+                birth_hour=hour,
+                da_yun_system=da_yun_system
+            ))
+        next_day = datetime(year, month, day) + timedelta(days=1)
+        candidates.append(cls.from_solar(next_day.year, next_day.month, next_day.day,
+                                         LATE_ZI_HOUR, is_male))
+        return AllHoursResult.from_candidates(candidates)
+    
+    @classmethod
+    def from_lunar(cls, year: int, month: int, day: int, hour: int, is_male: bool,
+                   is_leap: bool = False):
+        """从农历创建八字结果（is_leap 表示闰月）"""
+        solar_year, solar_month, solar_day = lunar_to_solar(year, month, day, is_leap)
+        return cls.from_solar(solar_year, solar_month, solar_day, hour, is_male)
+    
     def get_liu_nian(self, year: int) -> LiuNian:
         """获取指定年份的流年"""
         return create_liu_nian(year, self.birth_year, self.ba_zi.day.gan)
@@ -243,3 +367,64 @@ class BaZiResult:
             get_shi_shen(day_gan, self.ba_zi.hour.gan)
         ]
 
+
+# ==================== 时辰未知 ====================
+
+# 晚子时：23点出生按次日子时排盘（见 使用说明.md Q3）
+LATE_ZI_HOUR = 23
+
+
+def _chart_features(result: BaZiResult) -> Dict[str, str]:
+    """提取用于比较候选盘的特征（中文字符串）"""
+    bazi = result.ba_zi
+    shi_shen = result.get_si_zhu_shi_shen()
+    return {
+        'year': str(bazi.year),
+        'month': str(bazi.month),
+        'day': str(bazi.day),
+        'hour': str(bazi.hour),
+        'xun_kong': bazi.xun_kong_1 + bazi.xun_kong_2,
+        'year_shi_shen': shi_shen_to_zh(shi_shen[0]),
+        'month_shi_shen': shi_shen_to_zh(shi_shen[1]),
+        'hour_shi_shen': shi_shen_to_zh(shi_shen[3]),
+        'da_yun': ' '.join(str(d.pillar) for d in result.da_yun_system.da_yun_list),
+        'da_yun_shi_shen': ' '.join(
+            f"{shi_shen_to_zh(d.gan_shi_shen)}/{shi_shen_to_zh(d.zhi_shi_shen)}"
+            for d in result.da_yun_system.da_yun_list
+        ),
+    }
+
+
+@dataclass
+class AllHoursResult:
+    """全部时辰的候选排盘及其差异"""
+    candidates: List[BaZiResult]    # 依次为子时（0点）到亥时，末项为23点（次日子时）
+    shared: Dict[str, str]          # 当日12个时辰相同的特征
+    varying: Dict[str, List[str]]   # 当日随时辰变化的特征 -> 12个取值（子时到亥时）
+    late_zi_diff: Dict[str, Tuple[str, str]]    # 23点与当日子时不同的特征 -> (当日子时, 23点)
+    
+    @classmethod
+    def from_candidates(cls, candidates: List[BaZiResult]):
+        """candidates: 当日子时到亥时的12个候选盘，加上23点（次日子时）候选盘"""
+        features = [_chart_features(result) for result in candidates]
+        same_day = features[:len(SHICHEN_HOURS)]
+        shared = {}
+        varying = {}
+        for name in same_day[0]:
+            values = [f[name] for f in same_day]
+            if len(set(values)) == 1:
+                shared[name] = values[0]
+            else:
+                varying[name] = values
+        zi, late_zi = features[0], features[-1]
+        late_zi_diff = {
+            name: (zi[name], late_zi[name]) for name in zi if zi[name] != late_zi[name]
+        }
+        return cls(candidates=candidates, shared=shared, varying=varying,
+                   late_zi_diff=late_zi_diff)
+    
+    def by_hour(self, hour: int) -> BaZiResult:
+        """按出生小时（0-23）取候选盘，23点为次日子时"""
+        if hour == LATE_ZI_HOUR:
+            return self.candidates[-1]
+        return self.candidates[hour_to_shichen(hour)]
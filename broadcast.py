@@ -0,0 +1,175 @@
+#!/usr/bin/env python3
+"""
+每日运势批量推送
+当天的年、月、日柱只计算一次，再对所有用户打包后的原局四柱做查表映射，
+批量得出每个用户的十神和冲合标志，并按块流式输出
+"""
+import argparse
+import sys
+from dataclasses import dataclass
+from datetime import date
+from typing import BinaryIO, Dict, Iterable, Iterator, List, Tuple
+
+from ganzhi import (
+    TianGan, DiZhi, get_shi_shen, get_cang_gan, is_zhi_chong, is_zhi_he
+)
+from lunarcal import calculate_bazi, jiazi_from_index
+from bazi import BaZi
+
+
+# 原局打包格式：每个用户4字节，依次为年、月、日、时柱的六十甲子索引
+NATAL_RECORD_SIZE = 4
+
+# 当天参与比较的柱
+TODAY_PILLARS = ('year', 'month', 'day')
+
+# 每个当天柱输出3列：天干十神、地支十神（取藏干主气）、冲合标志
+# 冲合标志：第0-3位为原局年/月/日/时支与当天地支相冲，第4-7位为相合
+COLUMNS = tuple(
+    f"{name}_{field}"
+    for name in TODAY_PILLARS
+    for field in ('gan_shi_shen', 'zhi_shi_shen', 'flags')
+)
+
+# 无效索引（>=60）映射到的值
+INVALID = 0xFF
+
+
+# ==================== 打包 ====================
+
+def pack_natal(charts: Iterable[BaZi]) -> bytes:
+    """将原局八字打包为连续字节"""
+    return b''.join(bazi.pack() for bazi in charts)
+
+
+# ==================== 映射表 ====================
+
+def _table(func) -> bytes:
+    """由 六十甲子索引 -> 值 的函数生成 bytes.translate 用的256字节映射表"""
+    return bytes(func(*jiazi_from_index(i)) if i < 60 else INVALID for i in range(256))
+
+
+def build_tables(today: Dict[str, Tuple[TianGan, DiZhi]]) -> Dict[str, List[bytes]]:
+    """
+    为当天的柱生成映射表
+    返回: 列名 -> 映射表列表
+      十神列为一张表（以原局日柱为输入）
+      标志列为四张表（分别以原局年、月、日、时柱为输入，结果按位或）
+    """
+    tables = {}
+    for name in TODAY_PILLARS:
+        gan, zhi = today[name]
+        main_qi = get_cang_gan(zhi)[0]
+        tables[f"{name}_gan_shi_shen"] = [_table(lambda g, z: get_shi_shen(g, gan))]
+        tables[f"{name}_zhi_shi_shen"] = [_table(lambda g, z: get_shi_shen(g, main_qi))]
+        tables[f"{name}_flags"] = [
+            _table(lambda g, z, pos=pos: (is_zhi_chong(z, zhi) << pos) | (is_zhi_he(z, zhi) << (pos + 4)))
+            for pos in range(4)
+        ]
+    return tables
+
+
+def today_pillars(day: date) -> Dict[str, Tuple[TianGan, DiZhi]]:
+    """当天的年、月、日柱"""
+    return calculate_bazi(day.year, day.month, day.day, 12)
+
+
+# ==================== 批量计算 ====================
+
+@dataclass
+class BroadcastChunk:
+    """一块用户的推送结果，columns 中每列每个用户一个字节"""
+    start: int
+    count: int
+    columns: Dict[str, bytes]
+
+    def packed(self) -> bytes:
+        """按用户交错为行格式，每个用户 len(COLUMNS) 字节，列顺序同 COLUMNS"""
+        width = len(COLUMNS)
+        out = bytearray(self.count * width)
+        for i, name in enumerate(COLUMNS):
+            out[i::width] = self.columns[name]
+        return bytes(out)
+
+    def rows(self) -> Iterator[Tuple[int, Tuple[int, ...]]]:
+        """逐个用户输出 (用户行号, 各列值)"""
+        values = [self.columns[name] for name in COLUMNS]
+        for offset, row in enumerate(zip(*values)):
+            yield self.start + offset, row
+
+
+def _or_bytes(parts: List[bytes]) -> bytes:
+    """逐字节按位或（借助大整数运算一次完成）"""
+    acc = 0
+    for part in parts:
+        acc |= int.from_bytes(part, 'little')
+    return acc.to_bytes(len(parts[0]), 'little')
+
+
+def compute_chunk(natal: bytes, tables: Dict[str, List[bytes]], start: int = 0) -> BroadcastChunk:
+    """对一块打包原局数据计算推送结果"""
+    if len(natal) % NATAL_RECORD_SIZE:
+        raise ValueError("原局数据长度必须是4的倍数")
+    # 按列拆分：年、月、日、时柱
+    natal_columns = [natal[i::NATAL_RECORD_SIZE] for i in range(NATAL_RECORD_SIZE)]
+    day_column = natal_columns[2]
+
+    columns = {}
+    for name in COLUMNS:
+        if name.endswith('_flags'):
+            columns[name] = _or_bytes([
+                column.translate(table)
+                for column, table in zip(natal_columns, tables[name])
+            ])
+        else:
+            columns[name] = day_column.translate(tables[name][0])
+    return BroadcastChunk(start=start, count=len(day_column), columns=columns)
+
+
+def broadcast(natal: bytes, day: date, chunk_size: int = 1 << 20) -> Iterator[BroadcastChunk]:
+    """计算当天柱一次，按 chunk_size 个用户一块流式输出结果"""
+    tables = build_tables(today_pillars(day))
+    step = chunk_size * NATAL_RECORD_SIZE
+    view = memoryview(natal)
+    for offset in range(0, len(natal), step):
+        yield compute_chunk(bytes(view[offset:offset + step]), tables,
+                            offset // NATAL_RECORD_SIZE)
+
+
+def broadcast_file(natal_file: BinaryIO, out: BinaryIO, day: date,
+                   chunk_size: int = 1 << 20) -> int:
+    """从文件流式读取原局数据，结果按行格式写出，返回用户数"""
+    tables = build_tables(today_pillars(day))
+    total = 0
+    while True:
+        natal = natal_file.read(chunk_size * NATAL_RECORD_SIZE)
+        if not natal:
+            break
+        chunk = compute_chunk(natal, tables, total)
+        out.write(chunk.packed())
+        total += chunk.count
+    return total
+
+
+# ==================== 命令行 ====================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="计算当天柱对所有用户原局的十神与冲合")
+    parser.add_argument('natal', help="打包原局文件（每用户4字节）")
+    parser.add_argument('output', help="输出文件，'-' 为标准输出")
+    parser.add_argument('--date', type=date.fromisoformat, default=date.today())
+    parser.add_argument('--chunk-size', type=int, default=1 << 20, help="每块用户数")
+    args = parser.parse_args(argv)
+
+    with open(args.natal, 'rb') as natal_file:
+        if args.output == '-':
+            total = broadcast_file(natal_file, sys.stdout.buffer, args.date, args.chunk_size)
+        else:
+            with open(args.output, 'wb') as out:
+                total = broadcast_file(natal_file, out, args.date, args.chunk_size)
+    print(f"已处理 {total} 个用户（列：{', '.join(COLUMNS)}）", file=sys.stderr)
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,388 @@
+#!/usr/bin/env python3
+"""
+持久化排盘缓存
+基于sqlite3（WAL模式），以（日期, 时辰, 性别）为键保存打包后的四柱、大运和流年，
+支持多进程并发读取、按条数或数据字节数淘汰，以及按访问频率预热
+"""
+import argparse
+import csv
+import os
+import sqlite3
+from collections import Counter
+from dataclasses import dataclass
+from datetime import date
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ganzhi import ShiShen, zhi_to_zh, get_xun_kong
+from bazi import Pillar, BaZi, DaYunSystem, LiuNian, BaZiResult
+from lunarcal import hour_to_shichen
+
+
+# 缓存格式版本，打包格式变化时递增
+FORMAT_VERSION = 2
+
+# 每张盘缓存的流年数（从出生年开始）
+LIU_NIAN_YEARS = 100
+
+# 每条打包数据的字节数：四柱4 + 顺排和起运年龄2 + 每个流年3
+RECORD_BYTES = 6 + 3 * LIU_NIAN_YEARS
+
+
+# ==================== 键 ====================
+
+def chart_key(year: int, month: int, day: int, hour: int, is_male: bool) -> int:
+    """规范键：同一日期、同一时辰、同一性别的排盘结果相同"""
+    ordinal = date(year, month, day).toordinal()
+    return (ordinal * 12 + hour_to_shichen(hour)) * 2 + int(is_male)
+
+
+# ==================== 打包/解包 ====================
+# 布局（均为单字节）：
+#   四柱六十甲子索引 x4
+#   顺排标志、起运年龄
+#   每个流年：六十甲子索引、天干十神、地支十神
+
+def pack_result(result: BaZiResult, liu_nian_years: int = LIU_NIAN_YEARS) -> bytes:
+    """将排盘结果打包为字节串"""
+    bazi = result.ba_zi
+    system = result.da_yun_system
+    data = bytearray(bazi.pack())
+    data += bytes((int(system.shun_pai), system.qi_yun_age))
+    for year in range(result.birth_year, result.birth_year + liu_nian_years):
+        liu_nian = result.get_liu_nian(year)
+        data += bytes((liu_nian.pillar.jiazi_index, liu_nian.gan_shi_shen, liu_nian.zhi_shi_shen))
+    return bytes(data)
+
+
+@dataclass
+class CachedBaZiResult(BaZiResult):
+    """从缓存恢复的排盘结果，缓存范围内的流年直接读取打包数据"""
+    liu_nian_data: bytes = b''
+
+    def get_liu_nian(self, year: int) -> LiuNian:
+        """获取指定年份的流年"""
+        offset = (year - self.birth_year) * 3
+        if 0 <= offset < len(self.liu_nian_data):
+            index, gan_ss, zhi_ss = self.liu_nian_data[offset:offset + 3]
+            return LiuNian(
+                year=year,
+                pillar=Pillar.from_jiazi_index(index),
+                age=year - self.birth_year + 1,
+                gan_shi_shen=ShiShen(gan_ss),
+                zhi_shi_shen=ShiShen(zhi_ss)
+            )
+        return super().get_liu_nian(year)
+
+
+def unpack_result(data: bytes, year: int, month: int, day: int, hour: int,
+                  is_male: bool) -> CachedBaZiResult:
+    """从字节串恢复排盘结果"""
+    year_p, month_p, day_p, hour_p = (Pillar.from_jiazi_index(i) for i in data[:4])
+    kong1, kong2 = get_xun_kong(day_p.gan, day_p.zhi)
+    ba_zi = BaZi(
+        year=year_p,
+        month=month_p,
+        day=day_p,
+        hour=hour_p,
+        xun_kong_1=zhi_to_zh(kong1),
+        xun_kong_2=zhi_to_zh(kong2)
+    )
+
+    # 大运序列由月柱、排运方向和日干决定，取共享序列即可
+    shun_pai, qi_yun_age = data[4:6]
+    da_yun_system = DaYunSystem.restore(ba_zi, is_male, year, bool(shun_pai), qi_yun_age)
+
+    return CachedBaZiResult(
+        ba_zi=ba_zi,
+        is_male=is_male,
+        birth_year=year,
+        birth_month=month,
+        birth_day=day,
+        birth_hour=hour,
+        da_yun_system=da_yun_system,
+        liu_nian_data=bytes(data[6:])
+    )
+
+
+# ==================== 缓存 ====================
+
+class ChartCache:
+    """
+    sqlite3持久化排盘缓存
+    每个进程持有自己的连接（fork后自动重连），WAL模式下读者互不阻塞
+    """
+
+    # 访问计数在进程内累积，达到此数量后批量写回，避免每次读取都加写锁
+    HIT_FLUSH_INTERVAL = 1000
+
+    def __init__(self, path: str, max_entries: Optional[int] = None,
+                 timeout: float = 30.0, max_bytes: Optional[int] = None):
+        """
+        max_entries: 条目数上限
+        max_bytes: 打包数据总字节数上限（不含sqlite索引和页面开销，数据库文件会更大）
+        """
+        self.path = path
+        self.max_entries = max_entries
+        self.max_bytes = max_bytes
+        self.timeout = timeout
+        # 每写入约1%容量检查一次淘汰
+        limits = []
+        if max_entries is not None:
+            limits.append(max_entries)
+        if max_bytes is not None:
+            limits.append(max_bytes // RECORD_BYTES)
+        self._evict_interval = max(1, min(limits) // 100) if limits else None
+        self._conn: Optional[sqlite3.Connection] = None
+        self._pid: Optional[int] = None
+        self._pending_hits: Counter = Counter()
+        self._pending_count = 0
+        self._memory: Dict[int, bytes] = {}
+        self._puts_since_evict = 0
+        self._init_schema()
+
+    # ---------- 连接 ----------
+
+    @property
+    def conn(self) -> sqlite3.Connection:
+        """当前进程的连接"""
+        if self._conn is None or self._pid != os.getpid():
+            self._conn = sqlite3.connect(self.path, timeout=self.timeout,
+                                         isolation_level=None)
+            self._conn.execute("PRAGMA journal_mode=WAL")
+            self._conn.execute("PRAGMA synchronous=NORMAL")
+            self._pid = os.getpid()
+            self._pending_hits = Counter()
+            self._pending_count = 0
+        return self._conn
+
+    def _init_schema(self):
+        self.conn.execute(
+            "CREATE TABLE IF NOT EXISTS charts ("
+            " key INTEGER PRIMARY KEY,"
+            " version INTEGER NOT NULL,"
+            " data BLOB NOT NULL,"
+            " hits INTEGER NOT NULL DEFAULT 0,"
+            " last_access INTEGER NOT NULL DEFAULT 0)"
+        )
+        self.conn.execute(
+            "CREATE INDEX IF NOT EXISTS charts_last_access ON charts (last_access)"
+        )
+        self.conn.execute("CREATE INDEX IF NOT EXISTS charts_hits ON charts (hits)")
+
+    def close(self):
+        """写回访问计数并关闭连接"""
+        if self._conn is not None and self._pid == os.getpid():
+            self.flush()
+            self._conn.close()
+        self._conn = None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    # ---------- 读写 ----------
+
+    def get(self, key: int) -> Optional[bytes]:
+        """读取打包数据，未命中返回None"""
+        data = self._memory.get(key)
+        if data is None:
+            row = self.conn.execute(
+                "SELECT data FROM charts WHERE key = ? AND version = ?",
+                (key, FORMAT_VERSION)
+            ).fetchone()
+            if row is None:
+                return None
+            data = row[0]
+        self._record_hit(key)
+        return data
+
+    def put(self, key: int, data: bytes):
+        """写入打包数据"""
+        self.conn.execute(
+            "INSERT OR REPLACE INTO charts (key, version, data, hits, last_access)"
+            " VALUES (?, ?, ?, COALESCE((SELECT hits FROM charts WHERE key = ?), 0),"
+            " COALESCE((SELECT MAX(last_access) FROM charts), 0) + 1)",
+            (key, FORMAT_VERSION, data, key)
+        )
+        self._puts_since_evict += 1
+        if self._evict_interval is not None and self._puts_since_evict >= self._evict_interval:
+            self.evict()
+
+    def get_result(self, year: int, month: int, day: int, hour: int,
+                   is_male: bool) -> BaZiResult:
+        """读取排盘结果，未命中时计算并写入缓存"""
+        key = chart_key(year, month, day, hour, is_male)
+        data = self.get(key)
+        if data is None:
+            data = pack_result(BaZiResult.from_solar(year, month, day, hour, is_male))
+            self.put(key, data)
+        return unpack_result(data, year, month, day, hour, is_male)
+
+    # ---------- 访问统计与淘汰 ----------
+
+    def _record_hit(self, key: int):
+        self._pending_hits[key] += 1
+        self._pending_count += 1
+        if self._pending_count >= self.HIT_FLUSH_INTERVAL:
+            self.flush()
+
+    def flush(self):
+        """将进程内累积的访问计数写回数据库"""
+        if not self._pending_hits:
+            return
+        pending = self._pending_hits
+        self._pending_hits = Counter()
+        self._pending_count = 0
+        conn = self.conn
+        conn.execute("BEGIN IMMEDIATE")
+        try:
+            (tick,) = conn.execute(
+                "SELECT COALESCE(MAX(last_access), 0) FROM charts"
+            ).fetchone()
+            conn.executemany(
+                "UPDATE charts SET hits = hits + ?, last_access = ? WHERE key = ?",
+                [(count, tick + 1, key) for key, count in pending.items()]
+            )
+            conn.execute("COMMIT")
+        except BaseException:
+            conn.execute("ROLLBACK")
+            raise
+
+    def __len__(self) -> int:
+        (count,) = self.conn.execute("SELECT COUNT(*) FROM charts").fetchone()
+        return count
+
+    def evict(self) -> int:
+        """超过 max_entries 或 max_bytes 时删除最久未访问的条目，返回删除数"""
+        self._puts_since_evict = 0
+        removed = 0
+        if self.max_entries is not None:
+            excess = len(self) - self.max_entries
+            if excess > 0:
+                self.conn.execute(
+                    "DELETE FROM charts WHERE key IN"
+                    " (SELECT key FROM charts ORDER BY last_access LIMIT ?)",
+                    (excess,)
+                )
+                removed += excess
+        if self.max_bytes is not None:
+            (total,) = self.conn.execute(
+                "SELECT COALESCE(SUM(LENGTH(data)), 0) FROM charts"
+            ).fetchone()
+            excess_bytes = total - self.max_bytes
+            if excess_bytes > 0:
+                keys = []
+                freed = 0
+                for key, size in self.conn.execute(
+                    "SELECT key, LENGTH(data) FROM charts ORDER BY last_access"
+                ):
+                    keys.append((key,))
+                    freed += size
+                    if freed >= excess_bytes:
+                        break
+                self.conn.executemany("DELETE FROM charts WHERE key = ?", keys)
+                removed += len(keys)
+        return removed
+
+    # ---------- 预热 ----------
+
+    def load_hot(self, top_n: int) -> int:
+        """将访问次数最多的 top_n 条载入进程内存，返回载入数"""
+        rows = self.conn.execute(
+            "SELECT key, data FROM charts WHERE version = ?"
+            " ORDER BY hits DESC LIMIT ?",
+            (FORMAT_VERSION, top_n)
+        ).fetchall()
+        self._memory = {key: data for key, data in rows}
+        return len(rows)
+
+    def warm(self, inputs: Iterable[Tuple[int, int, int, int, bool]],
+             top_n: Optional[int] = None) -> int:
+        """
+        按出现频率预先计算并写入缓存
+        inputs: (年, 月, 日, 时, 是否男) 序列，可重复
+        返回新写入的条目数
+        """
+        counts: Counter = Counter()
+        first_seen = {}
+        for case in inputs:
+            key = chart_key(*case)
+            counts[key] += 1
+            first_seen.setdefault(key, case)
+
+        written = 0
+        for key, count in counts.most_common(top_n):
+            exists = self.conn.execute(
+                "SELECT 1 FROM charts WHERE key = ? AND version = ?",
+                (key, FORMAT_VERSION)
+            ).fetchone()
+            if exists is None:
+                self.put(key, pack_result(BaZiResult.from_solar(*first_seen[key])))
+                written += 1
+            self.conn.execute(
+                "UPDATE charts SET hits = MAX(hits, ?) WHERE key = ?", (count, key)
+            )
+        return written
+
+
+# ==================== 命令行 ====================
+
+# 输入文件中性别列的取值
+MALE_VALUES = ('男', '1', 'M', 'm', 'True', 'true')
+FEMALE_VALUES = ('女', '0', 'F', 'f', 'False', 'false')
+
+
+def parse_input_row(row: List[str]) -> Tuple[int, int, int, int, bool]:
+    """解析一行输入：年,月,日,时,性别（男/女、1/0、M/F 或 True/False），无法识别时抛出 ValueError"""
+    year, month, day, hour = (int(v) for v in row[:4])
+    gender = row[4].strip()
+    if gender in MALE_VALUES:
+        is_male = True
+    elif gender in FEMALE_VALUES:
+        is_male = False
+    else:
+        raise ValueError(f"无法识别的性别: {gender!r}")
+    return (year, month, day, hour, is_male)
+
+
+def read_inputs(path: str) -> List[Tuple[int, int, int, int, bool]]:
+    """读取输入CSV，跳过空行和#开头的注释行"""
+    cases = []
+    with open(path, newline='', encoding='utf-8') as f:
+        for row in csv.reader(f):
+            if not row or row[0].startswith('#'):
+                continue
+            cases.append(parse_input_row(row))
+    return cases
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="持久化排盘缓存工具")
+    sub = parser.add_subparsers(dest='command', required=True)
+
+    p_preload = sub.add_parser('preload', help="按频率预先计算输入中最常见的排盘")
+    p_preload.add_argument('db', help="缓存数据库路径")
+    p_preload.add_argument('inputs', help="输入CSV：年,月,日,时,性别")
+    p_preload.add_argument('--top', type=int, default=None, help="只预热最常见的N个键")
+    p_preload.add_argument('--max-entries', type=int, default=None, help="条目数上限")
+    p_preload.add_argument('--max-bytes', type=int, default=None, help="打包数据总字节数上限")
+
+    p_stats = sub.add_parser('stats', help="显示缓存条目数")
+    p_stats.add_argument('db', help="缓存数据库路径")
+
+    args = parser.parse_args(argv)
+
+    if args.command == 'preload':
+        with ChartCache(args.db, max_entries=args.max_entries, max_bytes=args.max_bytes) as cache:
+            written = cache.warm(read_inputs(args.inputs), args.top)
+            print(f"新写入: {written}，共 {len(cache)} 条")
+    else:
+        with ChartCache(args.db) as cache:
+            print(f"共 {len(cache)} 条")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
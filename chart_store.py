@@ -0,0 +1,322 @@
+#!/usr/bin/env python3
+"""
+位图索引排盘库
+对打包的四柱数据按列建立位图索引（每柱六十甲子、天干、地支、十神，以及旬空），
+用一个小型筛选表达式语言把查询编译为位图的与/或/非运算
+位图使用Python大整数，第i位对应第i行（计数用 int.bit_count，需要 Python 3.10+）
+
+表达式示例：
+    day.gan = 甲 and month.zhi in (寅, 卯) and hour.shishen = 七杀
+    日.干 = 甲 and (年.柱 = 甲子 or not 旬空 = 戌亥)
+"""
+import argparse
+import re
+import time
+from dataclasses import dataclass
+from typing import Dict, Iterable, List, Optional, Tuple
+
+from ganzhi import (
+    TianGan, TIAN_GAN_ZH, DI_ZHI_ZH, SHI_SHEN_ZH,
+    get_shi_shen, get_xun_kong
+)
+from lunarcal import jiazi_from_index
+from bazi import BaZi
+
+
+# 打包格式：每行4字节，依次为年、月、日、时柱的六十甲子索引
+RECORD_SIZE = 4
+
+POSITIONS = ('year', 'month', 'day', 'hour')
+
+# 中文别名
+POSITION_ALIASES = {'年': 'year', '月': 'month', '日': 'day', '时': 'hour'}
+ATTR_ALIASES = {'干': 'gan', '支': 'zhi', '柱': 'pillar', '十神': 'shishen'}
+XUN_KONG_FIELDS = ('xunkong', '旬空')
+
+JIAZI_ZH = [TIAN_GAN_ZH[g] + DI_ZHI_ZH[z] for g, z in map(jiazi_from_index, range(60))]
+
+
+def xun_kong_zh(xun: int) -> str:
+    """第 xun 旬（0-5）的旬空，如 '戌亥'"""
+    kong1, kong2 = get_xun_kong(*jiazi_from_index(xun * 10))
+    return DI_ZHI_ZH[kong1] + DI_ZHI_ZH[kong2]
+
+
+XUN_KONG_ZH = [xun_kong_zh(xun) for xun in range(6)]
+
+
+# ==================== 位图工具 ====================
+
+def _bitmap_from_column(column: bytes, value: int) -> int:
+    """由单字节列生成等于 value 的行的位图"""
+    table = bytearray(b'0' * 256)
+    table[value] = ord('1')
+    digits = column.translate(table)[::-1]
+    return int(digits, 2) if digits else 0
+
+
+def _or_all(bitmaps: Iterable[int]) -> int:
+    result = 0
+    for bitmap in bitmaps:
+        result |= bitmap
+    return result
+
+
+def bitmap_to_ids(bitmap: int, limit: Optional[int] = None) -> List[int]:
+    """位图转行号列表（升序）"""
+    bits = bin(bitmap)[:1:-1]
+    ids = []
+    i = bits.find('1')
+    while i != -1 and (limit is None or len(ids) < limit):
+        ids.append(i)
+        i = bits.find('1', i + 1)
+    return ids
+
+
+# ==================== 表达式 ====================
+
+class FilterSyntaxError(ValueError):
+    """筛选表达式语法错误"""
+
+
+_TOKEN_RE = re.compile(r'\s*(?:(!=|=|\(|\)|,)|([^\s=!(),]+))')
+
+
+def tokenize(expr: str) -> List[str]:
+    tokens = []
+    pos = 0
+    expr = expr.strip()
+    while pos < len(expr):
+        match = _TOKEN_RE.match(expr, pos)
+        if match is None or match.end() == pos:
+            raise FilterSyntaxError(f"无法识别的字符: {expr[pos:]!r}")
+        tokens.append(match.group(1) or match.group(2))
+        pos = match.end()
+    return tokens
+
+
+class _Parser:
+    """
+    递归下降解析：
+        expr   := term ('or' term)*
+        term   := factor ('and' factor)*
+        factor := 'not' factor | '(' expr ')' | cond
+        cond   := field ('=' | '!=') value | field 'in' '(' value (',' value)* ')'
+    解析结果为嵌套元组：('or', a, b)、('and', a, b)、('not', a)、('cond', field, op, values)
+    """
+
+    def __init__(self, tokens: List[str]):
+        self.tokens = tokens
+        self.pos = 0
+
+    def peek(self) -> Optional[str]:
+        return self.tokens[self.pos] if self.pos < len(self.tokens) else None
+
+    def take(self, expected: Optional[str] = None) -> str:
+        token = self.peek()
+        if token is None:
+            raise FilterSyntaxError("表达式不完整")
+        if expected is not None and token.lower() != expected:
+            raise FilterSyntaxError(f"期望 {expected!r}，实际为 {token!r}")
+        self.pos += 1
+        return token
+
+    def parse(self):
+        node = self.expr()
+        if self.peek() is not None:
+            raise FilterSyntaxError(f"多余的内容: {' '.join(self.tokens[self.pos:])}")
+        return node
+
+    def expr(self):
+        node = self.term()
+        while (self.peek() or '').lower() == 'or':
+            self.take()
+            node = ('or', node, self.term())
+        return node
+
+    def term(self):
+        node = self.factor()
+        while (self.peek() or '').lower() == 'and':
+            self.take()
+            node = ('and', node, self.factor())
+        return node
+
+    def factor(self):
+        token = self.peek()
+        if token is not None and token.lower() == 'not':
+            self.take()
+            return ('not', self.factor())
+        if token == '(':
+            self.take()
+            node = self.expr()
+            self.take(')')
+            return node
+        return self.cond()
+
+    def cond(self):
+        field = self.take()
+        op = self.take().lower()
+        if op in ('=', '!='):
+            return ('cond', field, op, [self.take()])
+        if op == 'in':
+            self.take('(')
+            values = [self.take()]
+            while self.peek() == ',':
+                self.take()
+                values.append(self.take())
+            self.take(')')
+            return ('cond', field, op, values)
+        raise FilterSyntaxError(f"未知运算符: {op!r}")
+
+
+def parse_filter(expr: str):
+    """解析筛选表达式为语法树"""
+    return _Parser(tokenize(expr)).parse()
+
+
+# ==================== 索引库 ====================
+
+@dataclass
+class QueryResult:
+    """查询结果"""
+    bitmap: int
+
+    @property
+    def count(self) -> int:
+        return self.bitmap.bit_count()
+
+    def row_ids(self, limit: Optional[int] = None) -> List[int]:
+        return bitmap_to_ids(self.bitmap, limit)
+
+
+class ChartStore:
+    """打包四柱数据的位图索引库"""
+
+    def __init__(self, packed: bytes):
+        if len(packed) % RECORD_SIZE:
+            raise ValueError("打包数据长度必须是4的倍数")
+        self.packed = packed
+        self.size = len(packed) // RECORD_SIZE
+        self.all = (1 << self.size) - 1
+
+        # 字段 -> {值名: 位图}
+        self.index: Dict[str, Dict[str, int]] = {}
+        self._build()
+
+    @classmethod
+    def from_charts(cls, charts: Iterable[BaZi]) -> 'ChartStore':
+        return cls(b''.join(bazi.pack() for bazi in charts))
+
+    @classmethod
+    def load(cls, path: str) -> 'ChartStore':
+        with open(path, 'rb') as f:
+            return cls(f.read())
+
+    def _build(self):
+        columns = [self.packed[i::RECORD_SIZE] for i in range(RECORD_SIZE)]
+        gan_bitmaps = {}
+        for pos, column in zip(POSITIONS, columns):
+            jiazi = [_bitmap_from_column(column, i) for i in range(60)]
+            gan = [_or_all(jiazi[i] for i in range(g, 60, 10)) for g in range(10)]
+            zhi = [_or_all(jiazi[i] for i in range(z, 60, 12)) for z in range(12)]
+            gan_bitmaps[pos] = gan
+            self.index[f"{pos}.pillar"] = dict(zip(JIAZI_ZH, jiazi))
+            self.index[f"{pos}.gan"] = dict(zip(TIAN_GAN_ZH, gan))
+            self.index[f"{pos}.zhi"] = dict(zip(DI_ZHI_ZH, zhi))
+
+        # 十神：对每个日干 d，十神 s 恰好对应一个天干 g
+        day_gan = gan_bitmaps['day']
+        for pos in POSITIONS:
+            shi_shen = [0] * 10
+            for d in range(10):
+                for g in range(10):
+                    shi_shen[get_shi_shen(TianGan(d), TianGan(g))] |= day_gan[d] & gan_bitmaps[pos][g]
+            self.index[f"{pos}.shishen"] = dict(zip(SHI_SHEN_ZH, shi_shen))
+
+        # 旬空：由日柱所在旬决定
+        day_jiazi = list(self.index['day.pillar'].values())
+        self.index['xunkong'] = {
+            XUN_KONG_ZH[xun]: _or_all(day_jiazi[xun * 10:xun * 10 + 10])
+            for xun in range(6)
+        }
+
+    # ---------- 查询 ----------
+
+    def _field(self, name: str) -> str:
+        if name in XUN_KONG_FIELDS:
+            return 'xunkong'
+        pos, _, attr = name.partition('.')
+        pos = POSITION_ALIASES.get(pos, pos)
+        attr = ATTR_ALIASES.get(attr, attr)
+        field = f"{pos}.{attr}"
+        if field not in self.index:
+            raise FilterSyntaxError(f"未知字段: {name!r}")
+        return field
+
+    def _values(self, field: str, values: List[str]) -> List[str]:
+        index = self.index[field]
+        result = []
+        for value in values:
+            if value in index:
+                result.append(value)
+            elif field.endswith(('.gan', '.zhi')) and all(ch in index for ch in value):
+                # 允许简写：month.zhi in (寅卯)
+                result.extend(value)
+            else:
+                raise FilterSyntaxError(f"字段 {field} 没有取值 {value!r}")
+        return result
+
+    def _evaluate(self, node) -> int:
+        kind = node[0]
+        if kind == 'and':
+            return self._evaluate(node[1]) & self._evaluate(node[2])
+        if kind == 'or':
+            return self._evaluate(node[1]) | self._evaluate(node[2])
+        if kind == 'not':
+            return self.all & ~self._evaluate(node[1])
+        _, name, op, values = node
+        field = self._field(name)
+        index = self.index[field]
+        bitmap = _or_all(index[v] for v in self._values(field, values))
+        return self.all & ~bitmap if op == '!=' else bitmap
+
+    def query(self, expr: str) -> QueryResult:
+        """执行筛选表达式"""
+        return QueryResult(self._evaluate(parse_filter(expr)))
+
+    def rows(self, row_ids: Iterable[int]) -> List[Tuple[str, str, str, str]]:
+        """按行号取出四柱（中文）"""
+        return [
+            tuple(JIAZI_ZH[i] for i in self.packed[r * RECORD_SIZE:(r + 1) * RECORD_SIZE])
+            for r in row_ids
+        ]
+
+
+# ==================== 命令行 ====================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="在打包四柱文件上执行筛选表达式")
+    parser.add_argument('packed', help="打包四柱文件（每行4字节）")
+    parser.add_argument('expr', help="筛选表达式，如 'day.gan = 甲 and hour.shishen = 七杀'")
+    parser.add_argument('--show', type=int, default=10, help="显示前N条匹配")
+    args = parser.parse_args(argv)
+
+    began = time.perf_counter()
+    store = ChartStore.load(args.packed)
+    built = time.perf_counter()
+    try:
+        result = store.query(args.expr)
+    except FilterSyntaxError as e:
+        parser.error(str(e))
+    done = time.perf_counter()
+
+    print(f"共 {store.size} 条，建索引 {built - began:.2f}秒，查询 {(done - built) * 1000:.1f}毫秒")
+    print(f"匹配: {result.count}")
+    row_ids = result.row_ids(args.show)
+    for row_id, pillars in zip(row_ids, store.rows(row_ids)):
+        print(f"  #{row_id}: {' '.join(pillars)}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,185 @@
+"""
+可编辑排盘
+记录输入（年月日时、性别）与四柱、旬空、十神、大运、流年之间的依赖关系，
+修改输入时只重算受影响的部分，并报告哪些结果发生了变化
+"""
+from dataclasses import dataclass
+from typing import Callable, Dict, List, Tuple
+
+from ganzhi import zhi_to_zh, get_shi_shen, get_xun_kong, get_gan_yin_yang, YinYang
+from lunarcal import get_year_pillar, get_month_pillar, get_day_pillar, get_hour_pillar
+from bazi import Pillar, BaZi, DaYunSystem, LiuNian, BaZiResult, create_liu_nian
+
+
+# ==================== 依赖图 ====================
+
+INPUTS = ('year', 'month', 'day', 'hour', 'is_male')
+
+
+def _ba_zi(v: dict) -> BaZi:
+    kong1, kong2 = v['xun_kong']
+    return BaZi(
+        year=Pillar.from_tuple(v['year_pillar']),
+        month=Pillar.from_tuple(v['month_pillar']),
+        day=Pillar.from_tuple(v['day_pillar']),
+        hour=Pillar.from_tuple(v['hour_pillar']),
+        xun_kong_1=zhi_to_zh(kong1),
+        xun_kong_2=zhi_to_zh(kong2)
+    )
+
+
+def _shi_shen(v: dict) -> tuple:
+    day_gan = v['day_pillar'][0]
+    return tuple(
+        get_shi_shen(day_gan, v[name][0])
+        for name in ('year_pillar', 'month_pillar', 'day_pillar', 'hour_pillar')
+    )
+
+
+def _shun_pai(v: dict) -> bool:
+    yang_year = (get_gan_yin_yang(v['year_pillar'][0]) == YinYang.YANG)
+    return v['is_male'] == yang_year
+
+
+# 节点 -> (依赖, 计算函数)，按拓扑顺序排列
+# 大运只依赖年干、月柱、日干、性别和出生年，时辰变化不会触发大运重算
+NODES: Dict[str, Tuple[Tuple[str, ...], Callable[[dict], object]]] = {
+    'year_pillar': (('year', 'month', 'day'),
+                    lambda v: get_year_pillar(v['year'], v['month'], v['day'])),
+    'month_pillar': (('year', 'month', 'day'),
+                     lambda v: get_month_pillar(v['year'], v['month'], v['day'])),
+    'day_pillar': (('year', 'month', 'day'),
+                   lambda v: get_day_pillar(v['year'], v['month'], v['day'])),
+    'hour_pillar': (('day_pillar', 'hour'),
+                    lambda v: get_hour_pillar(v['day_pillar'][0], v['hour'])),
+    'xun_kong': (('day_pillar',),
+                 lambda v: get_xun_kong(*v['day_pillar'])),
+    'ba_zi': (('year_pillar', 'month_pillar', 'day_pillar', 'hour_pillar', 'xun_kong'),
+              _ba_zi),
+    'shi_shen': (('year_pillar', 'month_pillar', 'day_pillar', 'hour_pillar'),
+                 _shi_shen),
+    'shun_pai': (('year_pillar', 'is_male'), _shun_pai),
+    'da_yun': (('shun_pai', 'month_pillar', 'day_pillar', 'year'),
+               lambda v: DaYunSystem(v['ba_zi'], v['is_male'], v['year'])),
+    'liu_nian': (('year', 'day_pillar'),
+                 lambda v: (v['year'], v['day_pillar'][0])),
+}
+
+
+def _same(old, new) -> bool:
+    """判断节点值是否未变（大运系统按排运结果比较）"""
+    if isinstance(old, DaYunSystem) and isinstance(new, DaYunSystem):
+        return (old.shun_pai == new.shun_pai
+                and old.qi_yun_age == new.qi_yun_age
+                and old.da_yun_list == new.da_yun_list)
+    return old == new
+
+
+@dataclass
+class ChartChange:
+    """一次修改的结果"""
+    changed: Tuple[str, ...]      # 值发生变化的输入和节点
+    recomputed: Tuple[str, ...]   # 被重新计算的节点（含值未变者）
+
+
+# ==================== 可编辑排盘 ====================
+
+class EditableChart:
+    """可增量更新的八字排盘"""
+
+    def __init__(self, year: int, month: int, day: int, hour: int, is_male: bool):
+        self._values: dict = {
+            'year': year, 'month': month, 'day': day, 'hour': hour, 'is_male': is_male
+        }
+        for name, (deps, compute) in NODES.items():
+            self._values[name] = compute(self._values)
+        self._liu_nian_cache: Dict[int, LiuNian] = {}
+
+    def __getitem__(self, name: str):
+        """读取输入或节点的当前值"""
+        return self._values[name]
+
+    def update(self, **changes) -> ChartChange:
+        """
+        修改输入并增量重算
+        例：chart.update(hour=9)、chart.update(is_male=False)
+        """
+        unknown = set(changes) - set(INPUTS)
+        if unknown:
+            raise ValueError(f"未知输入: {', '.join(sorted(unknown))}")
+
+        # 先整体校验新日期/时辰，失败时保持原状态不变
+        candidate = dict(self._values)
+        candidate.update(changes)
+        get_day_pillar(candidate['year'], candidate['month'], candidate['day'])
+        get_hour_pillar(candidate['day_pillar'][0], candidate['hour'])
+
+        dirty = [name for name, value in changes.items() if self._values[name] != value]
+        self._values.update(changes)
+        dirty_set = set(dirty)
+        recomputed = []
+        for name, (deps, compute) in NODES.items():
+            if dirty_set.isdisjoint(deps):
+                continue
+            new = compute(self._values)
+            recomputed.append(name)
+            if not _same(self._values[name], new):
+                self._values[name] = new
+                dirty.append(name)
+                dirty_set.add(name)
+
+        if 'liu_nian' in dirty_set:
+            self._liu_nian_cache.clear()
+        return ChartChange(changed=tuple(dirty), recomputed=tuple(recomputed))
+
+    # ---------- 结果 ----------
+
+    @property
+    def birth_year(self) -> int:
+        return self._values['year']
+
+    @property
+    def is_male(self) -> bool:
+        return self._values['is_male']
+
+    @property
+    def ba_zi(self) -> BaZi:
+        return self._values['ba_zi']
+
+    @property
+    def da_yun_system(self) -> DaYunSystem:
+        system = self._values['da_yun']
+        if system.bazi is not self.ba_zi or system.is_male != self._values['is_male']:
+            # 大运未重算时只替换引用的八字/性别，排运结果不变
+            system = DaYunSystem.restore(
+                self.ba_zi, self._values['is_male'], self._values['year'],
+                system.shun_pai, system.qi_yun_age
+            )
+            self._values['da_yun'] = system
+        return system
+
+    def get_si_zhu_shi_shen(self) -> List:
+        """获取四柱十神"""
+        return list(self._values['shi_shen'])
+
+    def get_liu_nian(self, year: int) -> LiuNian:
+        """获取指定年份的流年（按年缓存，出生年或日干变化时失效）"""
+        liu_nian = self._liu_nian_cache.get(year)
+        if liu_nian is None:
+            birth_year, day_gan = self._values['liu_nian']
+            liu_nian = create_liu_nian(year, birth_year, day_gan)
+            self._liu_nian_cache[year] = liu_nian
+        return liu_nian
+
+    def to_result(self) -> BaZiResult:
+        """导出为 BaZiResult"""
+        v = self._values
+        return BaZiResult(
+            ba_zi=self.ba_zi,
+            is_male=v['is_male'],
+            birth_year=v['year'],
+            birth_month=v['month'],
+            birth_day=v['day'],
+            birth_hour=v['hour'],
+            da_yun_system=self.da_yun_system
+        )
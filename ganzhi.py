@@ -3,7 +3,7 @@
 提供天干地支的枚举和相关运算
 """
 from enum import IntEnum
-from typing import List, Optional, Tuple
+from typing import Optional, Tuple
 
 
 # ==================== 枚举定义 ====================
@@ -120,32 +120,37 @@ def zh_to_zhi(zh: str) -> Optional[DiZhi]:
 
 # ==================== 五行属性 ====================
 
+# 查表均为模块级常量，避免每次调用重新构造
+
+GAN_WU_XING = [
+    WuXing.MU, WuXing.MU,      # 甲乙木
+    WuXing.HUO, WuXing.HUO,    # 丙丁火
+    WuXing.TU, WuXing.TU,      # 戊己土
+    WuXing.JIN, WuXing.JIN,    # 庚辛金
+    WuXing.SHUI, WuXing.SHUI   # 壬癸水
+]
+
+ZHI_WU_XING = [
+    WuXing.SHUI,                # 子水
+    WuXing.TU,                  # 丑土
+    WuXing.MU, WuXing.MU,       # 寅卯木
+    WuXing.TU,                  # 辰土
+    WuXing.HUO, WuXing.HUO,     # 巳午火
+    WuXing.TU,                  # 未土
+    WuXing.JIN, WuXing.JIN,     # 申酉金
+    WuXing.TU,                  # 戌土
+    WuXing.SHUI                 # 亥水
+]
+
+
 def get_gan_wu_xing(gan: TianGan) -> WuXing:
     """获取天干五行"""
-    wu_xing_map = [
-        WuXing.MU, WuXing.MU,      # 甲乙木
-        WuXing.HUO, WuXing.HUO,    # 丙丁火
-        WuXing.TU, WuXing.TU,      # 戊己土
-        WuXing.JIN, WuXing.JIN,    # 庚辛金
-        WuXing.SHUI, WuXing.SHUI   # 壬癸水
-    ]
-    return wu_xing_map[gan]
+    return GAN_WU_XING[gan]
 
 
 def get_zhi_wu_xing(zhi: DiZhi) -> WuXing:
     """获取地支五行"""
-    wu_xing_map = [
-        WuXing.SHUI,                # 子水
-        WuXing.TU,                  # 丑土
-        WuXing.MU, WuXing.MU,       # 寅卯木
-        WuXing.TU,                  # 辰土
-        WuXing.HUO, WuXing.HUO,     # 巳午火
-        WuXing.TU,                  # 未土
-        WuXing.JIN, WuXing.JIN,     # 申酉金
-        WuXing.TU,                  # 戌土
-        WuXing.SHUI                 # 亥水
-    ]
-    return wu_xing_map[zhi]
+    return ZHI_WU_XING[zhi]
 
 
 # ==================== 阴阳属性 ====================
@@ -162,49 +167,54 @@ def get_zhi_yin_yang(zhi: DiZhi) -> YinYang:
 
 # ==================== 五行生克关系 ====================
 
+WU_XING_SHENG = {
+    (WuXing.MU, WuXing.HUO),   # 木生火
+    (WuXing.HUO, WuXing.TU),   # 火生土
+    (WuXing.TU, WuXing.JIN),   # 土生金
+    (WuXing.JIN, WuXing.SHUI), # 金生水
+    (WuXing.SHUI, WuXing.MU)   # 水生木
+}
+
+WU_XING_KE = {
+    (WuXing.MU, WuXing.TU),    # 木克土
+    (WuXing.TU, WuXing.SHUI),  # 土克水
+    (WuXing.SHUI, WuXing.HUO), # 水克火
+    (WuXing.HUO, WuXing.JIN),  # 火克金
+    (WuXing.JIN, WuXing.MU)    # 金克木
+}
+
+
 def wu_xing_sheng(x: WuXing, y: WuXing) -> bool:
     """判断五行相生（x生y）"""
-    sheng_map = {
-        (WuXing.MU, WuXing.HUO): True,   # 木生火
-        (WuXing.HUO, WuXing.TU): True,   # 火生土
-        (WuXing.TU, WuXing.JIN): True,   # 土生金
-        (WuXing.JIN, WuXing.SHUI): True, # 金生水
-        (WuXing.SHUI, WuXing.MU): True   # 水生木
-    }
-    return sheng_map.get((x, y), False)
+    return (x, y) in WU_XING_SHENG
 
 
 def wu_xing_ke(x: WuXing, y: WuXing) -> bool:
     """判断五行相克（x克y）"""
-    ke_map = {
-        (WuXing.MU, WuXing.TU): True,    # 木克土
-        (WuXing.TU, WuXing.SHUI): True,  # 土克水
-        (WuXing.SHUI, WuXing.HUO): True, # 水克火
-        (WuXing.HUO, WuXing.JIN): True,  # 火克金
-        (WuXing.JIN, WuXing.MU): True    # 金克木
-    }
-    return ke_map.get((x, y), False)
+    return (x, y) in WU_XING_KE
 
 
 # ==================== 地支藏干 ====================
 
-def get_cang_gan(zhi: DiZhi) -> List[TianGan]:
+CANG_GAN = {
+    DiZhi.ZI: (TianGan.GUI,),
+    DiZhi.CHOU: (TianGan.JI, TianGan.GUI, TianGan.XIN),
+    DiZhi.YIN: (TianGan.JIA, TianGan.BING, TianGan.WU),
+    DiZhi.MAO: (TianGan.YI,),
+    DiZhi.CHEN: (TianGan.WU, TianGan.YI, TianGan.GUI),
+    DiZhi.SI: (TianGan.BING, TianGan.WU, TianGan.GENG),
+    DiZhi.WU: (TianGan.DING, TianGan.JI),
+    DiZhi.WEI: (TianGan.JI, TianGan.DING, TianGan.YI),
+    DiZhi.SHEN: (TianGan.GENG, TianGan.REN, TianGan.WU),
+    DiZhi.YOU: (TianGan.XIN,),
+    DiZhi.XU: (TianGan.WU, TianGan.XIN, TianGan.DING),
+    DiZhi.HAI: (TianGan.REN, TianGan.JIA)
+}
+
+
+def get_cang_gan(zhi: DiZhi) -> Tuple[TianGan, ...]:
     """获取地支藏干（主气、中气、余气）"""
-    cang_gan_table = {
-        DiZhi.ZI: [TianGan.GUI],
-        DiZhi.CHOU: [TianGan.JI, TianGan.GUI, TianGan.XIN],
-        DiZhi.YIN: [TianGan.JIA, TianGan.BING, TianGan.WU],
-        DiZhi.MAO: [TianGan.YI],
-        DiZhi.CHEN: [TianGan.WU, TianGan.YI, TianGan.GUI],
-        DiZhi.SI: [TianGan.BING, TianGan.WU, TianGan.GENG],
-        DiZhi.WU: [TianGan.DING, TianGan.JI],
-        DiZhi.WEI: [TianGan.JI, TianGan.DING, TianGan.YI],
-        DiZhi.SHEN: [TianGan.GENG, TianGan.REN, TianGan.WU],
-        DiZhi.YOU: [TianGan.XIN],
-        DiZhi.XU: [TianGan.WU, TianGan.XIN, TianGan.DING],
-        DiZhi.HAI: [TianGan.REN, TianGan.JIA]
-    }
-    return cang_gan_table[zhi]
+    return CANG_GAN[zhi]
 
 
 # ==================== 十神计算 ====================
@@ -234,6 +244,18 @@ def get_shi_shen(day_gan: TianGan, other_gan: TianGan) -> ShiShen:
         return ShiShen.PIAN_YIN if same_yy else ShiShen.ZHENG_YIN
 
 
+# ==================== 地支冲合 ====================
+
+def is_zhi_chong(a: DiZhi, b: DiZhi) -> bool:
+    """判断地支六冲（子午、丑未、寅申、卯酉、辰戌、巳亥）"""
+    return (a - b) % 12 == 6
+
+
+def is_zhi_he(a: DiZhi, b: DiZhi) -> bool:
+    """判断地支六合（子丑、寅亥、卯戌、辰酉、巳申、午未）"""
+    return (a + b) % 12 == 1
+
+
 # ==================== 旬空计算 ====================
 
 def get_xun_kong(day_gan: TianGan, day_zhi: DiZhi) -> Tuple[DiZhi, DiZhi]:
@@ -3,7 +3,7 @@
 使用简化的算法实现农历转换
 """
 from datetime import datetime
-from typing import Tuple
+from typing import List, Optional, Sequence, Tuple
 from ganzhi import TianGan, DiZhi, TIAN_GAN_ZH, DI_ZHI_ZH
 
 
@@ -201,6 +201,17 @@ def get_hour_pillar(day_gan: TianGan, hour: int) -> Tuple[TianGan, DiZhi]:
     return (hour_gan, hour_zhi)
 
 
+# ==================== 时辰 ====================
+
+# 十二时辰的代表小时（子时取0点，其余取时辰起点）
+SHICHEN_HOURS = [0, 1, 3, 5, 7, 9, 11, 13, 15, 17, 19, 21]
+
+
+def hour_to_shichen(hour: int) -> int:
+    """小时转时辰索引（0-11，23点与0点同为子时）"""
+    return ((hour + 1) // 2) % 12
+
+
 # ==================== 八字计算 ====================
 
 def calculate_bazi(year: int, month: int, day: int, hour: int) -> dict:
@@ -225,3 +236,135 @@ def calculate_bazi(year: int, month: int, day: int, hour: int) -> dict:
         'hour': hour_pillar
     }
 
+
+# ==================== 农历转换 ====================
+# 1900-2100年农历数据，每年一个整数：
+#   第0-3位：闰月月份（0为无闰月）
+#   第4-15位：正月到十二月的大小（第15位为正月，1为大月30天，0为小月29天）
+#   第16位：闰月大小（1为30天，0为29天）
+
+LUNAR_INFO = [
+    0x04bd8, 0x04ae0, 0x0a570, 0x054d5, 0x0d260, 0x0d950, 0x16554, 0x056a0, 0x09ad0, 0x055d2,  # 1900-1909
+    0x04ae0, 0x0a5b6, 0x0a4d0, 0x0d250, 0x1d255, 0x0b540, 0x0d6a0, 0x0ada2, 0x095b0, 0x14977,  # 1910-1919
+    0x04970, 0x0a4b0, 0x0b4b5, 0x06a50, 0x06d40, 0x1ab54, 0x02b60, 0x09570, 0x052f2, 0x04970,  # 1920-1929
+    0x06566, 0x0d4a0, 0x0ea50, 0x16a95, 0x05ad0, 0x02b60, 0x186e3, 0x092e0, 0x1c8d7, 0x0c950,  # 1930-1939
+    0x0d4a0, 0x1d8a6, 0x0b550, 0x056a0, 0x1a5b4, 0x025d0, 0x092d0, 0x0d2b2, 0x0a950, 0x0b557,  # 1940-1949
+    0x06ca0, 0x0b550, 0x15355, 0x04da0, 0x0a5b0, 0x14573, 0x052b0, 0x0a9a8, 0x0e950, 0x06aa0,  # 1950-1959
+    0x0aea6, 0x0ab50, 0x04b60, 0x0aae4, 0x0a570, 0x05260, 0x0f263, 0x0d950, 0x05b57, 0x056a0,  # 1960-1969
+    0x096d0, 0x04dd5, 0x04ad0, 0x0a4d0, 0x0d4d4, 0x0d250, 0x0d558, 0x0b540, 0x0b6a0, 0x195a6,  # 1970-1979
+    0x095b0, 0x049b0, 0x0a974, 0x0a4b0, 0x0b27a, 0x06a50, 0x06d40, 0x0af46, 0x0ab60, 0x09570,  # 1980-1989
+    0x04af5, 0x04970, 0x064b0, 0x074a3, 0x0ea50, 0x06b58, 0x05ac0, 0x0ab60, 0x096d5, 0x092e0,  # 1990-1999
+    0x0c960, 0x0d954, 0x0d4a0, 0x0da50, 0x07552, 0x056a0, 0x0abb7, 0x025d0, 0x092d0, 0x0cab5,  # 2000-2009
+    0x0a950, 0x0b4a0, 0x0baa4, 0x0ad50, 0x055d9, 0x04ba0, 0x0a5b0, 0x15176, 0x052b0, 0x0a930,  # 2010-2019
+    0x07954, 0x06aa0, 0x0ad50, 0x05b52, 0x04b60, 0x0a6e6, 0x0a4e0, 0x0d260, 0x0ea65, 0x0d530,  # 2020-2029
+    0x05aa0, 0x076a3, 0x096d0, 0x04afb, 0x04ad0, 0x0a4d0, 0x1d0b6, 0x0d250, 0x0d520, 0x0dd45,  # 2030-2039
+    0x0b5a0, 0x056d0, 0x055b2, 0x049b0, 0x0a577, 0x0a4b0, 0x0aa50, 0x1b255, 0x06d20, 0x0ada0,  # 2040-2049
+    0x14b63, 0x09370, 0x049f8, 0x04970, 0x064b0, 0x168a6, 0x0ea50, 0x06b20, 0x1a6c4, 0x0aae0,  # 2050-2059
+    0x092e0, 0x0d2e3, 0x0c960, 0x0d557, 0x0d4a0, 0x0da50, 0x05d55, 0x056a0, 0x0a6d0, 0x055d4,  # 2060-2069
+    0x052d0, 0x0a9b8, 0x0a950, 0x0b4a0, 0x0b6a6, 0x0ad50, 0x055a0, 0x0aba4, 0x0a5b0, 0x052b0,  # 2070-2079
+    0x0b273, 0x06930, 0x07337, 0x06aa0, 0x0ad50, 0x14b55, 0x04b60, 0x0a570, 0x054e4, 0x0d160,  # 2080-2089
+    0x0e968, 0x0d520, 0x0daa0, 0x16aa6, 0x056d0, 0x04ae0, 0x0a9d4, 0x0a2d0, 0x0d150, 0x0f252,  # 2090-2099
+    0x0d520,                                                                                    # 2100
+]
+
+LUNAR_START_YEAR = 1900
+LUNAR_END_YEAR = LUNAR_START_YEAR + len(LUNAR_INFO) - 1
+
+# 农历1900年正月初一 = 公历1900年1月31日
+LUNAR_BASE_ORDINAL = datetime(1900, 1, 31).toordinal()
+
+
+def _lunar_months(info: int) -> List[Tuple[int, bool, int]]:
+    """解码一年的月份序列：[(月份, 是否闰月, 天数), ...]"""
+    leap = info & 0xf
+    months = []
+    for m in range(1, 13):
+        months.append((m, False, 30 if info & (0x10000 >> m) else 29))
+        if m == leap:
+            months.append((m, True, 30 if info & 0x10000 else 29))
+    return months
+
+
+def _build_lunar_tables():
+    """
+    预计算前缀和：每年正月初一及每月初一相对基准日的天数，
+    以及逐日的农历年序号和月序号（各约73KB），使公历转农历为O(1)查表
+    """
+    year_starts = []
+    month_starts = []
+    month_list = []
+    year_of_day = bytearray()
+    month_of_day = bytearray()
+    offset = 0
+    for y, info in enumerate(LUNAR_INFO):
+        year_starts.append(offset)
+        months = _lunar_months(info)
+        starts = []
+        for i, (_, _, days) in enumerate(months):
+            starts.append(offset)
+            offset += days
+            year_of_day += bytes((y,)) * days
+            month_of_day += bytes((i,)) * days
+        month_starts.append(starts)
+        month_list.append(months)
+    year_starts.append(offset)
+    return year_starts, month_starts, month_list, bytes(year_of_day), bytes(month_of_day)
+
+
+# _LUNAR_YEAR_STARTS 多一项，为2100年末的后一天
+(_LUNAR_YEAR_STARTS, _LUNAR_MONTH_STARTS, _LUNAR_MONTHS,
+ _LUNAR_YEAR_OF_DAY, _LUNAR_MONTH_OF_DAY) = _build_lunar_tables()
+
+
+def solar_to_lunar(year: int, month: int, day: int) -> Tuple[int, int, int, bool]:
+    """
+    公历转农历
+    返回: (农历年, 农历月, 农历日, 是否闰月)
+    """
+    offset = datetime(year, month, day).toordinal() - LUNAR_BASE_ORDINAL
+    if not 0 <= offset < _LUNAR_YEAR_STARTS[-1]:
+        raise ValueError(f"日期超出农历数据范围（{LUNAR_START_YEAR}-{LUNAR_END_YEAR}年）")
+    y = _LUNAR_YEAR_OF_DAY[offset]
+    i = _LUNAR_MONTH_OF_DAY[offset]
+    lunar_month, is_leap, _ = _LUNAR_MONTHS[y][i]
+    return (LUNAR_START_YEAR + y, lunar_month, offset - _LUNAR_MONTH_STARTS[y][i] + 1, is_leap)
+
+
+def lunar_to_solar(year: int, month: int, day: int, is_leap: bool = False) -> Tuple[int, int, int]:
+    """
+    农历转公历
+    返回: (公历年, 公历月, 公历日)
+    """
+    if not LUNAR_START_YEAR <= year <= LUNAR_END_YEAR:
+        raise ValueError(f"农历年份超出范围（{LUNAR_START_YEAR}-{LUNAR_END_YEAR}年）")
+    if not 1 <= month <= 12:
+        raise ValueError(f"农历月份无效: {month}")
+    y = year - LUNAR_START_YEAR
+    leap = LUNAR_INFO[y] & 0xf
+    if is_leap and leap != month:
+        raise ValueError(f"农历{year}年没有闰{month}月")
+
+    # 闰月排在同名月之后
+    i = month - 1
+    if leap and (month > leap or (month == leap and is_leap)):
+        i += 1
+    days = _LUNAR_MONTHS[y][i][2]
+    if not 1 <= day <= days:
+        raise ValueError(f"农历{year}年{'闰' if is_leap else ''}{month}月只有{days}天")
+
+    solar = datetime.fromordinal(LUNAR_BASE_ORDINAL + _LUNAR_MONTH_STARTS[y][i] + day - 1)
+    return (solar.year, solar.month, solar.day)
+
+
+def solar_to_lunar_batch(years: Sequence[int], months: Sequence[int],
+                         days: Sequence[int]) -> List[Tuple[int, int, int, bool]]:
+    """批量公历转农历"""
+    return list(map(solar_to_lunar, years, months, days))
+
+
+def lunar_to_solar_batch(years: Sequence[int], months: Sequence[int], days: Sequence[int],
+                         leaps: Optional[Sequence[bool]] = None) -> List[Tuple[int, int, int]]:
+    """批量农历转公历"""
+    if leaps is None:
+        return list(map(lunar_to_solar, years, months, days))
+    return list(map(lunar_to_solar, years, months, days, leaps))
@@ -0,0 +1,122 @@
+#!/usr/bin/env python3
+"""
+预计算四柱表
+四柱只取决于（日期, 时辰），预先为1900-2100年每天12个时辰生成四柱，
+以内存映射文件共享给多个进程，查表即得四柱
+"""
+import argparse
+import mmap
+import struct
+import time
+from datetime import date, timedelta
+from typing import Optional
+
+from lunarcal import (
+    calculate_bazi, jiazi_from_index, get_sixty_jiazi_index,
+    hour_to_shichen, SHICHEN_HOURS
+)
+
+
+# 文件头：魔数、版本、起始日序数、天数
+MAGIC = b'BZPT'
+VERSION = 1
+HEADER = struct.Struct('<4sHII')
+
+# 每个（日期, 时辰）占4字节：年、月、日、时柱的六十甲子索引
+RECORD_SIZE = 4
+
+DEFAULT_START = date(1900, 1, 1)
+DEFAULT_END = date(2100, 12, 31)
+
+# 六十甲子索引 -> (天干, 地支)，查表时复用，避免重复构造
+_JIAZI = [jiazi_from_index(i) for i in range(60)]
+
+
+# ==================== 生成 ====================
+
+def build_table(path: str, start: date = DEFAULT_START, end: date = DEFAULT_END) -> int:
+    """由 calculate_bazi 生成四柱表文件，返回写入的天数"""
+    days = end.toordinal() - start.toordinal() + 1
+    with open(path, 'wb') as f:
+        f.write(HEADER.pack(MAGIC, VERSION, start.toordinal(), days))
+        current = start
+        one_day = timedelta(days=1)
+        for _ in range(days):
+            row = bytearray()
+            for hour in SHICHEN_HOURS:
+                bazi_data = calculate_bazi(current.year, current.month, current.day, hour)
+                for key in ('year', 'month', 'day', 'hour'):
+                    row.append(get_sixty_jiazi_index(*bazi_data[key]))
+            f.write(row)
+            current += one_day
+    return days
+
+
+# ==================== 查表 ====================
+
+class PillarTable:
+    """内存映射的四柱表，多个进程打开同一文件时共享物理内存"""
+
+    def __init__(self, path: str):
+        self.path = path
+        with open(path, 'rb') as f:
+            self._mmap = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+        magic, version, self.start_ordinal, self.days = HEADER.unpack_from(self._mmap)
+        if magic != MAGIC or version != VERSION:
+            self._mmap.close()
+            raise ValueError(f"不是有效的四柱表文件: {path}")
+        if len(self._mmap) != HEADER.size + self.days * 12 * RECORD_SIZE:
+            self._mmap.close()
+            raise ValueError(f"四柱表文件长度不符: {path}")
+
+    def close(self):
+        self._mmap.close()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+    def lookup_indices(self, year: int, month: int, day: int, hour: int) -> Optional[bytes]:
+        """查表获取四柱六十甲子索引（4字节），超出范围返回None"""
+        if not 0 <= hour <= 23:
+            return None
+        day_number = date(year, month, day).toordinal() - self.start_ordinal
+        if not 0 <= day_number < self.days:
+            return None
+        offset = HEADER.size + (day_number * 12 + hour_to_shichen(hour)) * RECORD_SIZE
+        return self._mmap[offset:offset + RECORD_SIZE]
+
+    def lookup(self, year: int, month: int, day: int, hour: int) -> Optional[dict]:
+        """查表获取完整八字，格式同 calculate_bazi，超出范围返回None"""
+        indices = self.lookup_indices(year, month, day, hour)
+        if indices is None:
+            return None
+        return {
+            'year': _JIAZI[indices[0]],
+            'month': _JIAZI[indices[1]],
+            'day': _JIAZI[indices[2]],
+            'hour': _JIAZI[indices[3]]
+        }
+
+
+# ==================== 命令行 ====================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="生成预计算四柱表")
+    parser.add_argument('output', help="输出文件路径")
+    parser.add_argument('--start', type=date.fromisoformat, default=DEFAULT_START)
+    parser.add_argument('--end', type=date.fromisoformat, default=DEFAULT_END)
+    args = parser.parse_args(argv)
+
+    began = time.perf_counter()
+    days = build_table(args.output, args.start, args.end)
+    size = HEADER.size + days * 12 * RECORD_SIZE
+    print(f"已生成 {days} 天 x 12 时辰，{size / 1024 / 1024:.1f} MB，"
+          f"耗时 {time.perf_counter() - began:.1f}秒")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
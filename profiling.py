@@ -0,0 +1,239 @@
+#!/usr/bin/env python3
+"""
+内存分配分析
+基于tracemalloc统计每个公开接口调用的分配块数和字节数，按函数细分，
+并提供分配预算检查，用于发现排盘热路径上的分配回归
+
+tracemalloc只能看到调用结束时仍存活的分配，临时对象以峰值字节数体现：
+  blocks/bytes：调用返回后仍存活的分配（结果对象及其引用的数据）
+  peak_bytes：调用过程中的内存峰值（含临时对象），每次采样前清空空闲对象链表，取多次调用的中位数
+"""
+import argparse
+import ast
+import gc
+import os
+import statistics
+import tracemalloc
+from collections import defaultdict
+from dataclasses import dataclass, field
+from functools import lru_cache
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bazi import BaZi, BaZiResult
+from lunarcal import calculate_bazi
+from ganzhi import TianGan, get_shi_shen
+
+
+# ==================== 被测接口 ====================
+
+_SAMPLE_RESULT = None
+
+
+def _sample_result() -> BaZiResult:
+    global _SAMPLE_RESULT
+    if _SAMPLE_RESULT is None:
+        _SAMPLE_RESULT = BaZiResult.from_solar(2000, 7, 15, 16, True)
+    return _SAMPLE_RESULT
+
+
+# 接口名 -> 无参调用
+API_CALLS: Dict[str, Callable[[], object]] = {
+    'calculate_bazi': lambda: calculate_bazi(2000, 7, 15, 16),
+    'get_shi_shen': lambda: get_shi_shen(TianGan.GENG, TianGan.JIA),
+    'BaZi.from_solar': lambda: BaZi.from_solar(2000, 7, 15, 16),
+    'BaZiResult.from_solar': lambda: BaZiResult.from_solar(2000, 7, 15, 16, True),
+    'BaZiResult.get_liu_nian': lambda: _sample_result().get_liu_nian(2024),
+    'BaZiResult.get_si_zhu_shi_shen': lambda: _sample_result().get_si_zhu_shi_shen(),
+    'DaYunSystem.da_yun_list': lambda: _sample_result().da_yun_system.da_yun_list,
+}
+
+# 分配预算：接口名 -> (每次调用存活块数上限, 每次调用峰值字节上限)
+# 约为当前实现实测值的1.25倍：峰值包含调用中的临时对象，每次调用新建查表用的list/dict即会超出
+# 修改热路径后如超出请先确认是否为预期变化，再按新的实测值更新
+ALLOCATION_BUDGETS: Dict[str, Tuple[float, int]] = {
+    'calculate_bazi': (7.5, 1860),              # 实测 6 块，峰值 1488 字节
+    'get_shi_shen': (0.5, 190),                 # 实测 0 块，峰值 152 字节
+    'BaZi.from_solar': (12.5, 3360),            # 实测 10 块，峰值 2688 字节
+    'BaZiResult.from_solar': (16, 3830),        # 实测 13 块，峰值 3064 字节
+    'BaZiResult.get_liu_nian': (5, 2750),       # 实测 4 块，峰值 2200 字节
+    'BaZiResult.get_si_zhu_shi_shen': (2.5, 240),   # 实测 2 块，峰值 192 字节
+    'DaYunSystem.da_yun_list': (78, 4810),      # 实测 62 块，峰值 3848 字节
+}
+
+
+# ==================== 统计 ====================
+
+@lru_cache(maxsize=None)
+def _function_ranges(filename: str) -> List[Tuple[int, int, str]]:
+    """解析源文件，返回 (起始行, 结束行, 函数限定名) 列表"""
+    try:
+        with open(filename, encoding='utf-8') as f:
+            tree = ast.parse(f.read())
+    except (OSError, SyntaxError, ValueError):
+        return []
+
+    ranges = []
+
+    def visit(node, prefix):
+        for child in ast.iter_child_nodes(node):
+            if isinstance(child, (ast.FunctionDef, ast.AsyncFunctionDef, ast.ClassDef)):
+                name = f"{prefix}{child.name}"
+                if not isinstance(child, ast.ClassDef):
+                    ranges.append((child.lineno, child.end_lineno, name))
+                visit(child, name + '.')
+            else:
+                visit(child, prefix)
+
+    visit(tree, '')
+    return ranges
+
+
+def function_at(filename: str, lineno: int) -> str:
+    """源文件某行所在的函数，如 'bazi.py:DaYunSystem._da_yun'"""
+    best = None
+    for start, end, name in _function_ranges(filename):
+        if start <= lineno <= end and (best is None or start >= best[0]):
+            best = (start, name)
+    return f"{os.path.basename(filename)}:{best[1] if best else '<module>'}"
+
+
+@dataclass
+class AllocationReport:
+    """一个接口的分配统计（均为每次调用的平均值）"""
+    name: str
+    calls: int
+    blocks: float
+    bytes: float
+    peak_bytes: int
+    by_function: List[Tuple[str, float, float]] = field(default_factory=list)
+
+    def __str__(self) -> str:
+        lines = [f"{self.name}: {self.blocks:.1f} 块 / {self.bytes:.0f} 字节存活，"
+                 f"峰值 {self.peak_bytes} 字节（{self.calls} 次调用平均，峰值取中位数）"]
+        for func, blocks, size in self.by_function:
+            lines.append(f"    {func:<50} {blocks:>7.1f} 块 {size:>9.0f} 字节")
+        return '\n'.join(lines)
+
+
+# 峰值按前若干次调用分别采样
+PEAK_SAMPLES = 15
+
+
+def profile_call(name: str, call: Callable[[], object], calls: int = 1000) -> AllocationReport:
+    """
+    统计调用的分配
+    先预热一次（填充共享序列等缓存），再连续调用 calls 次并保留全部返回值；
+    前 PEAK_SAMPLES 次调用分别记录峰值，取中位数
+    """
+    call()
+    results = [None] * calls
+    own_file = os.path.abspath(__file__)
+
+    gc.collect()
+    gc_was_enabled = gc.isenabled()
+    gc.disable()
+    tracemalloc.start(1)
+    try:
+        before = tracemalloc.take_snapshot()
+        peaks = []
+        samples = min(calls, PEAK_SAMPLES)
+        for i in range(samples):
+            # 清空空闲对象链表：复用链表中的对象不经过分配器，tracemalloc看不到，
+            # 不清空时峰值随此前的调用历史浮动
+            gc.collect()
+            tracemalloc.reset_peak()
+            base, _ = tracemalloc.get_traced_memory()
+            results[i] = call()
+            peaks.append(tracemalloc.get_traced_memory()[1] - base)
+        for i in range(samples, calls):
+            results[i] = call()
+        after = tracemalloc.take_snapshot()
+    finally:
+        tracemalloc.stop()
+        if gc_was_enabled:
+            gc.enable()
+
+    ignore = [tracemalloc.Filter(False, own_file), tracemalloc.Filter(False, tracemalloc.__file__)]
+    diff = after.filter_traces(ignore).compare_to(before.filter_traces(ignore), 'lineno')
+
+    per_function: Dict[str, List[float]] = defaultdict(lambda: [0, 0])
+    total_blocks = 0
+    total_bytes = 0
+    for stat in diff:
+        if stat.count_diff <= 0 and stat.size_diff <= 0:
+            continue
+        frame = stat.traceback[0]
+        acc = per_function[function_at(frame.filename, frame.lineno)]
+        acc[0] += stat.count_diff
+        acc[1] += stat.size_diff
+        total_blocks += stat.count_diff
+        total_bytes += stat.size_diff
+    del results
+
+    # 只列出平均每次调用至少1字节的函数
+    by_function = sorted(
+        ((func, blocks / calls, size / calls)
+         for func, (blocks, size) in per_function.items() if size >= calls),
+        key=lambda item: -item[2]
+    )
+    return AllocationReport(
+        name=name,
+        calls=calls,
+        blocks=total_blocks / calls,
+        bytes=total_bytes / calls,
+        peak_bytes=int(statistics.median(peaks)),
+        by_function=by_function
+    )
+
+
+def profile_all(calls: int = 1000, names: Optional[List[str]] = None) -> List[AllocationReport]:
+    """统计全部（或指定）接口"""
+    return [profile_call(name, API_CALLS[name], calls) for name in (names or API_CALLS)]
+
+
+def check_budgets(reports: List[AllocationReport]) -> List[str]:
+    """检查分配预算，返回超出预算的说明（为空表示全部通过）"""
+    failures = []
+    for report in reports:
+        budget = ALLOCATION_BUDGETS.get(report.name)
+        if budget is None:
+            continue
+        max_blocks, max_peak = budget
+        if report.blocks > max_blocks:
+            failures.append(f"{report.name}: 存活 {report.blocks:.1f} 块，超出预算 {max_blocks}")
+        if report.peak_bytes > max_peak:
+            failures.append(f"{report.name}: 峰值 {report.peak_bytes} 字节，超出预算 {max_peak}")
+    return failures
+
+
+# ==================== 命令行 ====================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="统计公开接口的内存分配")
+    parser.add_argument('names', nargs='*', help=f"接口名（默认全部）：{', '.join(API_CALLS)}")
+    parser.add_argument('--calls', type=int, default=1000, help="每个接口的调用次数")
+    parser.add_argument('--check', action='store_true', help="检查分配预算，超出时返回非零")
+    args = parser.parse_args(argv)
+
+    unknown = [name for name in args.names if name not in API_CALLS]
+    if unknown:
+        parser.error(f"未知接口: {', '.join(unknown)}")
+
+    reports = profile_all(args.calls, args.names or None)
+    for report in reports:
+        print(report)
+        print()
+
+    if args.check:
+        failures = check_budgets(reports)
+        if failures:
+            print("❌ 超出分配预算:")
+            for failure in failures:
+                print(f"  {failure}")
+            return 1
+        print("✅ 分配预算检查通过")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,326 @@
+#!/usr/bin/env python3
+"""
+相似命盘检索
+每张盘编码为定长特征：四柱天干/地支独热、十神分布、五行个数，
+两盘的相似度为共有特征数（十神、五行按个数取交集，即 min(a, b) 之和）
+
+检索基于 chart_store 的位图索引：
+  精确检索：把查询盘拥有的各特征位图按位切片累加，得到所有行的得分，再逐位确定前k名的阈值
+  分桶检索：按（日干, 月支）分为120个桶，各桶独立建索引，只搜查询所在及相近的桶（近似）
+"""
+import argparse
+import time
+from typing import Dict, Iterable, List, Optional, Sequence, Tuple
+
+from ganzhi import (
+    TianGan, DiZhi, WuXing, TIAN_GAN_ZH, DI_ZHI_ZH, SHI_SHEN_ZH, WU_XING_ZH,
+    get_shi_shen, get_cang_gan, get_gan_wu_xing, get_zhi_wu_xing
+)
+from lunarcal import jiazi_from_index
+from bazi import BaZi
+from chart_store import ChartStore, POSITIONS, RECORD_SIZE, JIAZI_ZH, _or_all, bitmap_to_ids
+
+
+# 十神分布：年、月、时干及四支主气共7项，个数按1-4级计
+SHI_SHEN_LEVELS = 4
+# 五行个数：四干四支共8个字，个数按1-8级计
+WU_XING_LEVELS = 8
+
+# 特征名，下标即特征位
+FEATURE_NAMES: List[str] = (
+    [f"{pos}.gan={g}" for pos in POSITIONS for g in TIAN_GAN_ZH]
+    + [f"{pos}.zhi={z}" for pos in POSITIONS for z in DI_ZHI_ZH]
+    + [f"shishen:{s}>={n}" for s in SHI_SHEN_ZH for n in range(1, SHI_SHEN_LEVELS + 1)]
+    + [f"wuxing:{WU_XING_ZH[wx]}>={n}" for wx in WuXing for n in range(1, WU_XING_LEVELS + 1)]
+)
+_GAN_BASE = 0
+_ZHI_BASE = _GAN_BASE + 4 * 10
+_SHI_SHEN_BASE = _ZHI_BASE + 4 * 12
+_WU_XING_BASE = _SHI_SHEN_BASE + 10 * SHI_SHEN_LEVELS
+
+# 数值嵌入维度：四柱干支独热(88) + 十神个数(10) + 五行个数(5)
+EMBEDDING_SIZE = 4 * 10 + 4 * 12 + 10 + 5
+
+
+# ==================== 特征 ====================
+
+def _counts(indices: Sequence[int]) -> Tuple[List[int], List[int]]:
+    """由四柱六十甲子索引统计十神个数和五行个数"""
+    pillars = [jiazi_from_index(i) for i in indices]
+    day_gan = pillars[2][0]
+    shi_shen = [0] * 10
+    for pos, (gan, zhi) in enumerate(pillars):
+        if pos != 2:
+            shi_shen[get_shi_shen(day_gan, gan)] += 1
+        shi_shen[get_shi_shen(day_gan, get_cang_gan(zhi)[0])] += 1
+    wu_xing = [0] * 5
+    for gan, zhi in pillars:
+        wu_xing[get_gan_wu_xing(gan) - 1] += 1
+        wu_xing[get_zhi_wu_xing(zhi) - 1] += 1
+    return shi_shen, wu_xing
+
+
+def embedding(indices: Sequence[int]) -> Tuple[int, ...]:
+    """
+    定长数值嵌入（EMBEDDING_SIZE 维）
+    indices: 四柱六十甲子索引，可传 BaZi.pack() 的结果
+    """
+    vector = [0] * (4 * 10 + 4 * 12)
+    for pos, i in enumerate(indices):
+        vector[pos * 10 + i % 10] = 1
+        vector[40 + pos * 12 + i % 12] = 1
+    shi_shen, wu_xing = _counts(indices)
+    return tuple(vector + shi_shen + wu_xing)
+
+
+def feature_bits(indices: Sequence[int]) -> int:
+    """特征位集合（位序同 FEATURE_NAMES）"""
+    bits = 0
+    for pos, i in enumerate(indices):
+        bits |= 1 << (_GAN_BASE + pos * 10 + i % 10)
+        bits |= 1 << (_ZHI_BASE + pos * 12 + i % 12)
+    shi_shen, wu_xing = _counts(indices)
+    for s, count in enumerate(shi_shen):
+        for n in range(min(count, SHI_SHEN_LEVELS)):
+            bits |= 1 << (_SHI_SHEN_BASE + s * SHI_SHEN_LEVELS + n)
+    for wx, count in enumerate(wu_xing):
+        for n in range(min(count, WU_XING_LEVELS)):
+            bits |= 1 << (_WU_XING_BASE + wx * WU_XING_LEVELS + n)
+    return bits
+
+
+def similarity(a: Sequence[int], b: Sequence[int]) -> int:
+    """两盘相似度（共有特征数）"""
+    return (feature_bits(a) & feature_bits(b)).bit_count()
+
+
+# ==================== 位图工具 ====================
+
+def _thresholds(indicators: Iterable[int], all_rows: int, levels: int) -> List[int]:
+    """由若干指示位图得到 “个数>=n” 的位图（n=1..levels）"""
+    ge = [all_rows] + [0] * levels
+    for bitmap in indicators:
+        for n in range(levels, 0, -1):
+            ge[n] |= ge[n - 1] & bitmap
+    return ge[1:]
+
+
+def _add_sliced(planes: List[int], bitmap: int) -> None:
+    """把位图按位切片加到计数器上（planes[i] 为各行得分的第i位）"""
+    carry = bitmap
+    for i in range(len(planes)):
+        if not carry:
+            return
+        planes[i], carry = planes[i] ^ carry, planes[i] & carry
+    if carry:
+        planes.append(carry)
+
+
+def _top_k_bitmap(planes: List[int], candidates: int, k: int) -> Tuple[int, int, int]:
+    """
+    由位切片得分确定前k名
+    返回 (得分高于阈值的行位图, 得分等于阈值的行位图, 还需从后者中取的行数)
+    """
+    above = 0
+    equal = candidates
+    for plane in reversed(planes):
+        high = equal & plane
+        if (above | high).bit_count() >= k:
+            equal = high
+        else:
+            above |= high
+            equal &= ~plane
+    return above, equal, k - above.bit_count()
+
+
+# ==================== 精确检索 ====================
+
+class SimilarityIndex:
+    """基于位图的精确相似检索"""
+
+    def __init__(self, store: ChartStore):
+        self.store = store
+        self.feature_bitmaps = self._build_features()
+
+    @classmethod
+    def from_packed(cls, packed: bytes) -> 'SimilarityIndex':
+        return cls(ChartStore(packed))
+
+    @classmethod
+    def from_charts(cls, charts: Iterable[BaZi]) -> 'SimilarityIndex':
+        return cls(ChartStore.from_charts(charts))
+
+    @property
+    def size(self) -> int:
+        return self.store.size
+
+    def _build_features(self) -> List[int]:
+        index = self.store.index
+        gan = {pos: [index[f"{pos}.gan"][g] for g in TIAN_GAN_ZH] for pos in POSITIONS}
+        zhi = {pos: [index[f"{pos}.zhi"][z] for z in DI_ZHI_ZH] for pos in POSITIONS}
+        bitmaps = []
+        for pos in POSITIONS:
+            bitmaps.extend(gan[pos])
+        for pos in POSITIONS:
+            bitmaps.extend(zhi[pos])
+
+        # 十神指示位图：年、月、时干直接取索引，四支主气按日干组合
+        day_gan = gan['day']
+        indicators = {s: [] for s in range(10)}
+        for pos in ('year', 'month', 'hour'):
+            for s, name in enumerate(SHI_SHEN_ZH):
+                indicators[s].append(index[f"{pos}.shishen"][name])
+        for pos in POSITIONS:
+            per_pos = [0] * 10
+            for d in range(10):
+                for z in range(12):
+                    s = get_shi_shen(TianGan(d), get_cang_gan(DiZhi(z))[0])
+                    per_pos[s] |= day_gan[d] & zhi[pos][z]
+            for s in range(10):
+                indicators[s].append(per_pos[s])
+        for s in range(10):
+            bitmaps.extend(_thresholds(indicators[s], self.store.all, SHI_SHEN_LEVELS))
+
+        # 五行指示位图：每个字一项
+        for wx in WuXing:
+            items = []
+            for pos in POSITIONS:
+                items.append(_or_all(gan[pos][g] for g in range(10)
+                                     if get_gan_wu_xing(TianGan(g)) == wx))
+                items.append(_or_all(zhi[pos][z] for z in range(12)
+                                     if get_zhi_wu_xing(DiZhi(z)) == wx))
+            bitmaps.extend(_thresholds(items, self.store.all, WU_XING_LEVELS))
+        return bitmaps
+
+    def row_indices(self, row_id: int) -> bytes:
+        return self.store.packed[row_id * RECORD_SIZE:(row_id + 1) * RECORD_SIZE]
+
+    def scores(self, query: Sequence[int], candidates: Optional[int] = None) -> List[int]:
+        """所有行相对查询盘的得分（位切片形式）"""
+        bits = feature_bits(query)
+        planes: List[int] = []
+        for f, bitmap in enumerate(self.feature_bitmaps):
+            if bits >> f & 1:
+                _add_sliced(planes, bitmap if candidates is None else bitmap & candidates)
+        return planes
+
+    def search(self, query: Sequence[int], k: int = 10, where: Optional[str] = None,
+               exclude: Iterable[int] = ()) -> List[Tuple[int, int]]:
+        """
+        返回最相似的k行：[(行号, 得分), ...]，得分降序、同分按行号升序
+        query: 四柱六十甲子索引（如 BaZi.pack()）
+        where: 可选的 chart_store 筛选表达式，只在匹配行中检索
+        exclude: 排除的行号（如查询盘自身）
+        """
+        candidates = self.store.all
+        if where:
+            candidates &= self.store.query(where).bitmap
+        for row_id in exclude:
+            candidates &= ~(1 << row_id)
+        if k <= 0 or not candidates:
+            return []
+
+        planes = self.scores(query, candidates)
+        above, equal, remaining = _top_k_bitmap(planes, candidates, k)
+        row_ids = bitmap_to_ids(above) + bitmap_to_ids(equal, max(remaining, 0))
+        bits = feature_bits(query)
+        results = [
+            (row_id, (bits & feature_bits(self.row_indices(row_id))).bit_count())
+            for row_id in row_ids
+        ]
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:k]
+
+
+# ==================== 分桶检索（近似） ====================
+
+def _bucket_key(indices: Sequence[int]) -> Tuple[int, int]:
+    """桶键：（日干, 月支）"""
+    return (indices[2] % 10, indices[1] % 12)
+
+
+class BucketedSimilarityIndex:
+    """
+    按（日干, 月支）分桶的近似检索
+    先搜查询所在的桶，nprobe>1 时再按桶键相近程度（同日干、同月支）依次多搜几个桶
+    """
+
+    def __init__(self, store: ChartStore):
+        self.store = store
+        self.buckets: Dict[Tuple[int, int], Tuple[SimilarityIndex, List[int]]] = {}
+        index = store.index
+        packed = store.packed
+        for g, gan_zh in enumerate(TIAN_GAN_ZH):
+            day_gan = index['day.gan'][gan_zh]
+            for z, zhi_zh in enumerate(DI_ZHI_ZH):
+                row_ids = bitmap_to_ids(day_gan & index['month.zhi'][zhi_zh])
+                if not row_ids:
+                    continue
+                sub = b''.join(packed[r * RECORD_SIZE:(r + 1) * RECORD_SIZE] for r in row_ids)
+                self.buckets[(g, z)] = (SimilarityIndex(ChartStore(sub)), row_ids)
+
+    @classmethod
+    def from_packed(cls, packed: bytes) -> 'BucketedSimilarityIndex':
+        return cls(ChartStore(packed))
+
+    def probe_order(self, query: Sequence[int]) -> List[Tuple[int, int]]:
+        """按与查询桶键的相近程度排列各桶"""
+        g, z = _bucket_key(query)
+        return sorted(self.buckets, key=lambda key: (-((key[0] == g) * 2 + (key[1] == z)), key))
+
+    def search(self, query: Sequence[int], k: int = 10, nprobe: int = 1,
+               exclude: Iterable[int] = ()) -> List[Tuple[int, int]]:
+        """返回近似最相似的k行：[(全局行号, 得分), ...]"""
+        exclude = set(exclude)
+        results = []
+        for key in self.probe_order(query)[:nprobe]:
+            sub_index, row_ids = self.buckets[key]
+            local_exclude = [i for i, r in enumerate(row_ids) if r in exclude] if exclude else ()
+            for local_id, score in sub_index.search(query, k, exclude=local_exclude):
+                results.append((row_ids[local_id], score))
+        results.sort(key=lambda item: (-item[1], item[0]))
+        return results[:k]
+
+
+# ==================== 命令行 ====================
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="在打包四柱文件中检索相似命盘")
+    parser.add_argument('packed', help="打包四柱文件（每行4字节）")
+    parser.add_argument('date', help="查询盘出生日期 YYYY-MM-DD")
+    parser.add_argument('hour', type=int, help="查询盘出生小时（0-23）")
+    parser.add_argument('-k', type=int, default=10, help="返回条数")
+    parser.add_argument('--where', default=None, help="chart_store 筛选表达式")
+    parser.add_argument('--approx', action='store_true', help="使用分桶近似检索")
+    parser.add_argument('--nprobe', type=int, default=1, help="近似检索搜索的桶数")
+    args = parser.parse_args(argv)
+
+    year, month, day = (int(v) for v in args.date.split('-'))
+    query = BaZi.from_solar(year, month, day, args.hour).pack()
+
+    with open(args.packed, 'rb') as f:
+        packed = f.read()
+    began = time.perf_counter()
+    if args.approx:
+        if args.where:
+            parser.error("--where 只支持精确检索")
+        index = BucketedSimilarityIndex.from_packed(packed)
+    else:
+        index = SimilarityIndex.from_packed(packed)
+    built = time.perf_counter()
+    if args.approx:
+        results = index.search(query, args.k, args.nprobe)
+    else:
+        results = index.search(query, args.k, args.where)
+    done = time.perf_counter()
+
+    print(f"查询盘: {' '.join(JIAZI_ZH[i] for i in query)}")
+    print(f"共 {index.store.size} 条，建索引 {built - began:.2f}秒，检索 {(done - built) * 1000:.1f}毫秒")
+    for row_id, score in results:
+        pillars = index.store.rows([row_id])[0]
+        print(f"  #{row_id}: {' '.join(pillars)}  相似度 {score}")
+    return 0
+
+
+if __name__ == "__main__":
+    exit(main())
@@ -0,0 +1,174 @@
+"""
+真太阳时预处理
+将带时区、经度和夏令时标志的出生时间批量校正为真太阳时，
+输出可直接用于排盘的（日期, 时辰）数组
+真太阳时 = 世界时 + 经度 x 4分钟/度 + 均时差（按日预计算）
+23点出生按本库约定算次日子时（见 使用说明.md Q3），排盘日期为次日
+"""
+import calendar
+import math
+from array import array
+from dataclasses import dataclass
+from datetime import date, datetime, timedelta
+from itertools import repeat
+from operator import add, attrgetter, floordiv, mod, mul, sub
+from typing import List, Optional, Sequence
+
+from lunarcal import hour_to_shichen
+
+
+# 时间戳起点：以1970-01-01 00:00（当地钟表时间）起算的分钟数
+EPOCH = date(1970, 1, 1)
+EPOCH_ORDINAL = EPOCH.toordinal()
+
+# 均时差表覆盖范围
+TABLE_START = date(1900, 1, 1)
+TABLE_END = date(2100, 12, 31)
+
+SECONDS_PER_DAY = 86400
+
+# 小时 -> 时辰索引，供 bytes.translate 整列映射
+_SHICHEN_OF_HOUR = bytes(hour_to_shichen(h) if h < 24 else 0 for h in range(256))
+# 小时 -> 排盘日期需要顺延的天数（23点为次日子时）
+_LATE_ZI_OF_HOUR = bytes(1 if h == 23 else 0 for h in range(256))
+
+
+# ==================== 均时差 ====================
+
+def equation_of_time(day: date) -> float:
+    """
+    均时差（秒），真太阳时减平太阳时
+    采用NOAA近似公式，取当日正午，误差约半分钟以内
+    """
+    days_in_year = 366 if calendar.isleap(day.year) else 365
+    gamma = 2 * math.pi / days_in_year * (day.timetuple().tm_yday - 1)
+    minutes = 229.18 * (0.000075
+                        + 0.001868 * math.cos(gamma)
+                        - 0.032077 * math.sin(gamma)
+                        - 0.014615 * math.cos(2 * gamma)
+                        - 0.040849 * math.sin(2 * gamma))
+    return minutes * 60
+
+
+_eot_table: Optional[array] = None
+# 表中第0项对应的日序号（相对 EPOCH 的天数）
+_EOT_BASE = TABLE_START.toordinal() - EPOCH_ORDINAL
+
+
+def eot_table() -> array:
+    """1900-2100年逐日均时差表（整数秒），首次使用时生成"""
+    global _eot_table
+    if _eot_table is None:
+        days = TABLE_END.toordinal() - TABLE_START.toordinal() + 1
+        _eot_table = array('h', (
+            round(equation_of_time(TABLE_START + timedelta(days=i))) for i in range(days)
+        ))
+    return _eot_table
+
+
+def _gather_eot(day_numbers: List[int]) -> List[int]:
+    """按日序号批量取均时差（秒），超出表范围的日期直接按公式计算"""
+    table = eot_table()
+    if not day_numbers:
+        return []
+    if min(day_numbers) >= _EOT_BASE and max(day_numbers) < _EOT_BASE + len(table):
+        return list(map(table.__getitem__, map(sub, day_numbers, repeat(_EOT_BASE))))
+    result = []
+    for n in day_numbers:
+        i = n - _EOT_BASE
+        if 0 <= i < len(table):
+            result.append(table[i])
+        else:
+            result.append(round(equation_of_time(date.fromordinal(n + EPOCH_ORDINAL))))
+    return result
+
+
+# ==================== 批量校正 ====================
+
+@dataclass
+class CorrectedBirths:
+    """校正后的出生时间（各数组等长）"""
+    year: array       # 真太阳时日期
+    month: array
+    day: array
+    hour: array       # 真太阳时小时（0-23）
+    minute: array
+    shichen: array    # 时辰索引（0-11，23点与0点同为子时）
+    chart_year: array   # 排盘日期：23点顺延为次日，其余同真太阳时日期
+    chart_month: array
+    chart_day: array
+
+    def __len__(self) -> int:
+        return len(self.year)
+
+    def rows(self):
+        """逐行输出 (排盘年, 月, 日, 时)，可直接传给 BaZi.from_solar"""
+        return zip(self.chart_year, self.chart_month, self.chart_day, self.hour)
+
+
+def correct_batch(local_minutes: Sequence[int],
+                  longitude: Sequence[float],
+                  utc_offset_minutes: Sequence[int],
+                  dst: Optional[Sequence[int]] = None) -> CorrectedBirths:
+    """
+    批量校正为真太阳时
+    local_minutes: 当地钟表时间，自1970-01-01 00:00起的分钟数（见 local_minutes）
+    longitude: 出生地经度（东经为正）
+    utc_offset_minutes: 标准时区偏移（分钟，如北京时间为480）
+    dst: 夏令时标志（1表示当时处于夏令时，钟表拨快了60分钟）
+    各步均为整列运算（map + operator），不逐行进入Python代码
+    """
+    n = len(local_minutes)
+    if len(longitude) != n or len(utc_offset_minutes) != n or (dst is not None and len(dst) != n):
+        raise ValueError("输入数组长度不一致")
+
+    # 世界时（秒）
+    offsets = utc_offset_minutes
+    if dst is not None:
+        offsets = list(map(add, offsets, map(mul, dst, repeat(60))))
+    utc = list(map(mul, map(sub, local_minutes, offsets), repeat(60)))
+
+    # 平太阳时：经度每度4分钟
+    lmt = list(map(add, utc, map(round, map(mul, longitude, repeat(240.0)))))
+
+    # 真太阳时：加上当日均时差
+    eot = _gather_eot(list(map(floordiv, lmt, repeat(SECONDS_PER_DAY))))
+    true_solar = list(map(add, lmt, eot))
+
+    day_numbers = list(map(floordiv, true_solar, repeat(SECONDS_PER_DAY)))
+    seconds = list(map(mod, true_solar, repeat(SECONDS_PER_DAY)))
+    ordinals = list(map(add, day_numbers, repeat(EPOCH_ORDINAL)))
+    dates = list(map(date.fromordinal, ordinals))
+    hours = array('b', map(floordiv, seconds, repeat(3600)))
+    late_zi = bytes(hours).translate(_LATE_ZI_OF_HOUR)
+    chart_dates = list(map(date.fromordinal, map(add, ordinals, late_zi)))
+
+    return CorrectedBirths(
+        year=array('h', map(attrgetter('year'), dates)),
+        month=array('b', map(attrgetter('month'), dates)),
+        day=array('b', map(attrgetter('day'), dates)),
+        hour=hours,
+        minute=array('b', map(floordiv, map(mod, seconds, repeat(3600)), repeat(60))),
+        shichen=array('b', bytes(hours).translate(_SHICHEN_OF_HOUR)),
+        chart_year=array('h', map(attrgetter('year'), chart_dates)),
+        chart_month=array('b', map(attrgetter('month'), chart_dates)),
+        chart_day=array('b', map(attrgetter('day'), chart_dates)),
+    )
+
+
+# ==================== 单条 ====================
+
+def local_minutes(year: int, month: int, day: int, hour: int, minute: int = 0) -> int:
+    """当地钟表时间转为自1970-01-01 00:00起的分钟数"""
+    return (date(year, month, day).toordinal() - EPOCH_ORDINAL) * 1440 + hour * 60 + minute
+
+
+def true_solar_time(dt: datetime, longitude: float, utc_offset_minutes: int,
+                    dst: bool = False) -> datetime:
+    """单个出生时间校正为真太阳时（精确到分钟）"""
+    result = correct_batch(
+        [local_minutes(dt.year, dt.month, dt.day, dt.hour, dt.minute)],
+        [longitude], [utc_offset_minutes], [int(dst)]
+    )
+    return datetime(result.year[0], result.month[0], result.day[0],
+                    result.hour[0], result.minute[0])
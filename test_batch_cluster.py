@@ -0,0 +1,109 @@
+"""
+多节点批量排盘测试
+在本机端到端运行协调器和工作进程，并覆盖工作进程失联、全部退出时协调器能结束
+
+运行：python -m unittest test_batch_cluster
+"""
+import csv
+import io
+import os
+import shutil
+import tempfile
+import time
+import unittest
+from contextlib import redirect_stderr
+from unittest import mock
+
+import batch_cluster
+from batch_cluster import (
+    OUTPUT_HEADER, FAILED, Coordinator, chart_rows, run_coordinator, split_file, wait_for_shards
+)
+from bazi import BaZiResult
+from chart_cache import parse_input_row
+
+
+ROWS = [
+    (1990 + i % 30, i % 12 + 1, i % 28 + 1, i % 24, '男' if i % 2 else '女')
+    for i in range(40)
+]
+
+AUTHKEY = b'test'
+LOCALHOST = ('127.0.0.1', 0)
+
+
+def _crash(*args, **kwargs):
+    """模拟启动后立即崩溃的工作进程"""
+    os._exit(1)
+
+
+class BatchClusterTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir = tempfile.mkdtemp()
+        self.input = os.path.join(self.dir, 'input.csv')
+        with open(self.input, 'w', encoding='utf-8', newline='') as f:
+            writer = csv.writer(f)
+            writer.writerow(OUTPUT_HEADER[:5])
+            writer.writerows(ROWS)
+        self.output = os.path.join(self.dir, 'output.csv')
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def run_cluster(self, **kwargs) -> int:
+        with redirect_stderr(io.StringIO()):
+            return run_coordinator([self.input], self.output, self.output + '.shards',
+                                   LOCALHOST, AUTHKEY, shard_size=7, report_seconds=60, **kwargs)
+
+    def test_end_to_end(self):
+        self.assertEqual(self.run_cluster(local_workers=3), 0)
+        with open(self.output, encoding='utf-8', newline='') as f:
+            merged = list(csv.reader(f))
+        self.assertEqual(merged[0], OUTPUT_HEADER)
+        self.assertEqual(len(merged) - 1, len(ROWS))
+        for row, line in zip(ROWS, merged[1:]):
+            expected = BaZiResult.from_solar(*parse_input_row([str(v) for v in row])).ba_zi
+            self.assertEqual(line[:4], [str(v) for v in row[:4]])
+            self.assertEqual(line[5:9], [str(expected.year), str(expected.month),
+                                         str(expected.day), str(expected.hour)])
+            self.assertEqual(line[-1], '')
+
+    def test_all_local_workers_crash(self):
+        with mock.patch.object(batch_cluster, 'run_worker', _crash):
+            began = time.time()
+            self.assertEqual(self.run_cluster(local_workers=2), 1)
+        self.assertLess(time.time() - began, 30)
+        self.assertFalse(os.path.exists(self.output))
+
+    def test_no_workers_times_out(self):
+        self.assertEqual(self.run_cluster(idle_timeout=1), 1)
+
+    def test_dead_worker_lease(self):
+        shards = split_file(self.input, 7)
+        coordinator = Coordinator(shards, os.path.join(self.dir, 'shards'),
+                                  max_retries=1, lease_seconds=0.5)
+        task = coordinator.get_task('ghost')
+        self.assertEqual(task['status'], 'task')
+        # 领取分片后失联：租约过期后分片回到待领取，无人领取时按空闲超时放弃
+        wait_for_shards(coordinator, [], idle_timeout=1, report_seconds=60)
+        self.assertTrue(coordinator.finished())
+        self.assertEqual(len(coordinator.failed_shards()), len(shards))
+        self.assertTrue(all(s.state == FAILED for s in coordinator.shards.values()))
+
+    def test_error_rows(self):
+        output, rows = chart_rows("year,month,day,hour,gender\nbad,row\n2000,1,1,0,x\n")
+        lines = list(csv.reader(output.splitlines()))
+        self.assertEqual(rows, 2)
+        self.assertEqual([len(line) for line in lines], [len(OUTPUT_HEADER)] * 2)
+        self.assertTrue(all(line[-1] for line in lines))
+
+    def test_gender_values(self):
+        self.assertTrue(parse_input_row(['2000', '1', '1', '0', 'M'])[4])
+        self.assertFalse(parse_input_row(['2000', '1', '1', '0', 'F'])[4])
+        self.assertFalse(parse_input_row(['2000', '1', '1', '0', '女'])[4])
+        with self.assertRaises(ValueError):
+            parse_input_row(['2000', '1', '1', '0', 'male'])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,71 @@
+"""
+农历转换测试
+核对已知春节和闰月日期，并对整个数据范围做公历-农历往返校验
+
+运行：python -m unittest test_lunarcal
+"""
+import unittest
+from datetime import date, timedelta
+
+from lunarcal import (
+    LUNAR_BASE_ORDINAL, solar_to_lunar, lunar_to_solar,
+    solar_to_lunar_batch, lunar_to_solar_batch
+)
+
+
+# 春节（农历正月初一）的公历日期
+SPRING_FESTIVALS = [
+    (1900, 1, 31), (1949, 1, 29), (1950, 2, 17), (1980, 2, 16), (1990, 1, 27),
+    (2000, 2, 5), (2001, 1, 24), (2008, 2, 7), (2010, 2, 14), (2012, 1, 23),
+    (2015, 2, 19), (2020, 1, 25), (2021, 2, 12), (2022, 2, 1), (2023, 1, 22),
+    (2024, 2, 10), (2025, 1, 29), (2033, 1, 31), (2050, 1, 23), (2100, 2, 9),
+]
+
+# (农历年, 闰月) -> 闰月初一的公历日期
+LEAP_MONTHS = {
+    (2020, 4): (2020, 5, 23),
+    (2023, 2): (2023, 3, 22),
+    (2033, 11): (2033, 12, 22),
+}
+
+
+class LunarConversionTest(unittest.TestCase):
+
+    def test_spring_festivals(self):
+        for solar in SPRING_FESTIVALS:
+            with self.subTest(solar=solar):
+                self.assertEqual(solar_to_lunar(*solar), (solar[0], 1, 1, False))
+                self.assertEqual(lunar_to_solar(solar[0], 1, 1), solar)
+
+    def test_leap_months(self):
+        for (year, month), solar in LEAP_MONTHS.items():
+            with self.subTest(year=year, month=month):
+                self.assertEqual(lunar_to_solar(year, month, 1, is_leap=True), solar)
+                self.assertEqual(solar_to_lunar(*solar), (year, month, 1, True))
+
+    def test_round_trip_full_range(self):
+        current = date.fromordinal(LUNAR_BASE_ORDINAL)
+        end = date(2100, 12, 31)
+        while current <= end:
+            lunar = solar_to_lunar(current.year, current.month, current.day)
+            self.assertEqual(lunar_to_solar(*lunar), (current.year, current.month, current.day),
+                             f"{current} -> {lunar}")
+            current += timedelta(days=1)
+
+    def test_batch_matches_single(self):
+        solars = SPRING_FESTIVALS + list(LEAP_MONTHS.values())
+        lunars = solar_to_lunar_batch(*zip(*solars))
+        self.assertEqual(lunars, [solar_to_lunar(*s) for s in solars])
+        self.assertEqual(lunar_to_solar_batch(*zip(*lunars)), solars)
+
+    def test_out_of_range(self):
+        with self.assertRaises(ValueError):
+            solar_to_lunar(1900, 1, 30)
+        with self.assertRaises(ValueError):
+            lunar_to_solar(1899, 1, 1)
+        with self.assertRaises(ValueError):
+            lunar_to_solar(2023, 3, 1, is_leap=True)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,45 @@
+"""
+分配预算测试
+排盘热路径的分配超出 profiling.ALLOCATION_BUDGETS 时失败
+
+运行：python -m unittest test_profiling
+"""
+import unittest
+from unittest import mock
+
+import ganzhi
+from ganzhi import WuXing
+from profiling import API_CALLS, ALLOCATION_BUDGETS, check_budgets, profile_all
+
+
+def _wu_xing_ke_per_call(x: WuXing, y: WuXing) -> bool:
+    """每次调用都新建查表dict的实现（预算要防止的回归）"""
+    ke_map = {
+        (WuXing.MU, WuXing.TU): True,
+        (WuXing.TU, WuXing.SHUI): True,
+        (WuXing.SHUI, WuXing.HUO): True,
+        (WuXing.HUO, WuXing.JIN): True,
+        (WuXing.JIN, WuXing.MU): True
+    }
+    return ke_map.get((x, y), False)
+
+
+class AllocationBudgetTest(unittest.TestCase):
+
+    def test_every_api_has_budget(self):
+        self.assertEqual(set(API_CALLS), set(ALLOCATION_BUDGETS))
+
+    def test_within_budgets(self):
+        failures = check_budgets(profile_all(calls=200))
+        self.assertEqual(failures, [], '\n'.join(failures))
+
+    def test_per_call_temporary_exceeds_budget(self):
+        names = ['get_shi_shen', 'BaZiResult.get_si_zhu_shi_shen']
+        with mock.patch.object(ganzhi, 'wu_xing_ke', _wu_xing_ke_per_call):
+            failures = check_budgets(profile_all(calls=200, names=names))
+        for name in names:
+            self.assertTrue(any(f.startswith(name + ':') for f in failures), failures)
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,82 @@
+"""
+真太阳时测试
+核对时区、夏令时、经度的符号约定，均时差表，以及23点排盘日期顺延
+
+运行：python -m unittest test_solar_time
+"""
+import unittest
+from datetime import date, datetime
+
+from solar_time import (
+    EPOCH_ORDINAL, TABLE_START, TABLE_END,
+    equation_of_time, eot_table, correct_batch, local_minutes, true_solar_time
+)
+
+
+class SolarTimeTest(unittest.TestCase):
+
+    def test_known_value(self):
+        # 北京时间12:00，东经87.6度：世界时04:00，平太阳时09:50，7月中旬均时差约-6分钟
+        self.assertEqual(true_solar_time(datetime(2000, 7, 15, 12, 0), 87.6, 480),
+                         datetime(2000, 7, 15, 9, 44))
+
+    def test_dst_shifts_back_one_hour(self):
+        birth = datetime(2000, 7, 15, 12, 0)
+        standard = true_solar_time(birth, 87.6, 480)
+        summer = true_solar_time(birth, 87.6, 480, dst=True)
+        self.assertEqual((standard - summer).total_seconds(), 3600)
+
+    def test_sign_conventions(self):
+        birth = datetime(2000, 3, 1, 12, 0)
+        # 经度每向东1度早4分钟，时区偏移越大世界时越早
+        east = true_solar_time(birth, 121.0, 480)
+        west = true_solar_time(birth, 120.0, 480)
+        self.assertEqual((east - west).total_seconds(), 240)
+        utc = true_solar_time(birth, 0.0, 0)
+        new_york = true_solar_time(birth, -75.0, -300)
+        self.assertEqual(utc, new_york)
+
+    def test_late_zi_chart_date(self):
+        result = correct_batch([local_minutes(2000, 12, 31, 23, 30)], [122.0], [480])
+        self.assertEqual((result.year[0], result.month[0], result.day[0]), (2000, 12, 31))
+        self.assertEqual(result.hour[0], 23)
+        self.assertEqual(result.shichen[0], 0)
+        self.assertEqual((result.chart_year[0], result.chart_month[0], result.chart_day[0]),
+                         (2001, 1, 1))
+        self.assertEqual(list(result.rows()), [(2001, 1, 1, 23)])
+
+    def test_chart_date_unchanged_before_23(self):
+        result = correct_batch([local_minutes(2000, 12, 31, 22, 0)], [120.0], [480])
+        self.assertEqual(list(result.rows()), [(2000, 12, 31, 21)])
+
+    def test_eot_table(self):
+        table = eot_table()
+        self.assertEqual(len(table), TABLE_END.toordinal() - TABLE_START.toordinal() + 1)
+        for day in (date(1900, 1, 1), date(2000, 2, 11), date(2000, 11, 3), date(2100, 12, 31)):
+            self.assertEqual(table[day.toordinal() - TABLE_START.toordinal()],
+                             round(equation_of_time(day)))
+        # 均时差全年约在-14分钟到+16.5分钟之间
+        self.assertLess(min(table), -13 * 60)
+        self.assertGreater(max(table), 16 * 60)
+
+    def test_outside_table_uses_formula(self):
+        for day in (date(1850, 7, 15), date(2150, 7, 15)):
+            result = correct_batch([local_minutes(day.year, day.month, day.day, 12, 0)],
+                                   [120.0], [480])
+            # 东经120度、东八区：平太阳时即钟表时间，真太阳时只差均时差
+            seconds = 12 * 3600 + round(equation_of_time(day))
+            self.assertEqual((result.hour[0], result.minute[0]),
+                             (seconds // 3600, seconds % 3600 // 60))
+
+    def test_local_minutes_epoch(self):
+        self.assertEqual(local_minutes(1970, 1, 1, 0, 0), 0)
+        self.assertEqual(local_minutes(2000, 1, 1, 1, 30),
+                         (date(2000, 1, 1).toordinal() - EPOCH_ORDINAL) * 1440 + 90)
+
+    def test_length_mismatch(self):
+        with self.assertRaises(ValueError):
+            correct_batch([0, 1], [120.0], [480, 480])
+
+
+if __name__ == "__main__":
+    unittest.main()
@@ -0,0 +1,256 @@
+#!/usr/bin/env python3
+"""
+等价性校验
+穷举1900-2100年每个（日期, 时辰, 性别），在进程池中对比候选引擎与参考实现的排盘结果
+"""
+import argparse
+import time
+from datetime import date, timedelta
+from multiprocessing import Pool
+from typing import Callable, Dict, List, Optional, Tuple
+
+from bazi import BaZiResult
+from lunarcal import SHICHEN_HOURS
+
+
+# ==================== 引擎注册 ====================
+
+def _reference_engine(arg: Optional[str]) -> Callable:
+    """参考实现：BaZiResult.from_solar"""
+    return BaZiResult.from_solar
+
+
+def _chart_cache_engine(arg: Optional[str]) -> Callable:
+    """持久化缓存：chart_cache:数据库路径（默认内存库，校验打包/解包往返）"""
+    from chart_cache import ChartCache
+    return ChartCache(arg or ':memory:').get_result
+
+
+def _pillar_table_engine(arg: Optional[str]) -> Callable:
+    """预计算四柱表：pillar_table:表文件路径"""
+    import bazi
+    from pillar_table import PillarTable
+    if not arg:
+        raise ValueError("pillar_table 引擎需要表文件路径，例如 pillar_table:pillars.bin")
+    table = PillarTable(arg)
+
+    def engine(*case):
+        # 只在候选调用期间启用，参考实现仍走计算路径
+        bazi.use_pillar_table(table)
+        try:
+            return BaZiResult.from_solar(*case)
+        finally:
+            bazi.use_pillar_table(None)
+    return engine
+
+
+def _editable_engine(arg: Optional[str]) -> Callable:
+    """可编辑排盘：同一对象依次增量更新到每个用例"""
+    from editable import EditableChart
+    state = {}
+
+    def engine(year, month, day, hour, is_male):
+        chart = state.get('chart')
+        if chart is None:
+            chart = state['chart'] = EditableChart(year, month, day, hour, is_male)
+        else:
+            chart.update(year=year, month=month, day=day, hour=hour, is_male=is_male)
+        return chart
+    return engine
+
+
+def _all_hours_engine(arg: Optional[str]) -> Callable:
+    """时辰未知模式：按日期一次排出男女两组全部时辰，再取对应时辰的候选盘"""
+    from lunarcal import hour_to_shichen
+    state = {}
+
+    def engine(year, month, day, hour, is_male):
+        key = (year, month, day)
+        if state.get('key') != key:
+            state['key'] = key
+            state['results'] = {
+                gender: BaZiResult.from_solar_all_hours(year, month, day, gender)
+                for gender in (True, False)
+            }
+        # 用例的23点按当日排盘（与参考引擎一致），取当日子时候选而非晚子时
+        return state['results'][is_male].candidates[hour_to_shichen(hour)]
+    return engine
+
+
+# 引擎名 -> 工厂函数（参数为命令行中 name:arg 的 arg 部分）
+# 工厂返回 (year, month, day, hour, is_male) -> 八字结果 的函数
+ENGINES: Dict[str, Callable[[Optional[str]], Callable]] = {
+    'reference': _reference_engine,
+    'chart_cache': _chart_cache_engine,
+    'pillar_table': _pillar_table_engine,
+    'editable': _editable_engine,
+    'all_hours': _all_hours_engine,
+}
+
+
+def load_engine(spec: str) -> Callable:
+    """按 name 或 name:arg 加载引擎"""
+    name, _, arg = spec.partition(':')
+    if name not in ENGINES:
+        raise ValueError(f"未知引擎: {name}（可选: {', '.join(sorted(ENGINES))}）")
+    return ENGINES[name](arg or None)
+
+
+# ==================== 结果签名 ====================
+
+def chart_signature(result, liu_nian_span: int) -> tuple:
+    """
+    将排盘结果归一为可比较的元组
+    覆盖四柱、旬空、四柱十神、大运及出生后 liu_nian_span 年的流年
+    """
+    bazi = result.ba_zi
+    pillars = tuple(
+        (int(p.gan), int(p.zhi))
+        for p in (bazi.year, bazi.month, bazi.day, bazi.hour)
+    )
+    system = result.da_yun_system
+    da_yun = tuple(
+        (int(d.pillar.gan), int(d.pillar.zhi), d.start_age, d.end_age,
+         d.start_year, d.end_year, int(d.gan_shi_shen), int(d.zhi_shi_shen))
+        for d in system.da_yun_list
+    )
+    liu_nian = []
+    for year in range(result.birth_year, result.birth_year + liu_nian_span):
+        ln = result.get_liu_nian(year)
+        liu_nian.append((ln.year, int(ln.pillar.gan), int(ln.pillar.zhi), ln.age,
+                         int(ln.gan_shi_shen), int(ln.zhi_shi_shen)))
+    return (
+        pillars,
+        (bazi.xun_kong_1, bazi.xun_kong_2),
+        tuple(int(ss) for ss in result.get_si_zhu_shi_shen()),
+        (system.shun_pai, system.qi_yun_age),
+        da_yun,
+        tuple(liu_nian),
+    )
+
+
+# ==================== 分片校验 ====================
+
+def iter_cases(start: date, end: date):
+    """枚举 [start, end] 内所有（日期, 时辰代表小时, 性别）"""
+    current = start
+    one_day = timedelta(days=1)
+    while current <= end:
+        for hour in SHICHEN_HOURS:
+            for is_male in (True, False):
+                yield current.year, current.month, current.day, hour, is_male
+        current += one_day
+
+
+def check_range(task: Tuple[str, str, int, int, int, int]) -> Tuple[int, List[tuple]]:
+    """
+    校验一个日期区间
+    task: (参考引擎, 候选引擎, 起始序数日, 结束序数日, 流年跨度, 最多记录差异数)
+    返回: (用例数, 差异列表)
+    """
+    ref_spec, cand_spec, start_ord, end_ord, liu_nian_span, max_diffs = task
+    reference = load_engine(ref_spec)
+    candidate = load_engine(cand_spec)
+
+    count = 0
+    diffs = []
+    for case in iter_cases(date.fromordinal(start_ord), date.fromordinal(end_ord)):
+        count += 1
+        expected = chart_signature(reference(*case), liu_nian_span)
+        try:
+            actual = chart_signature(candidate(*case), liu_nian_span)
+        except Exception as e:
+            actual = f"异常: {e!r}"
+        if actual != expected and len(diffs) < max_diffs:
+            diffs.append((case, expected, actual))
+    return count, diffs
+
+
+def split_range(start: date, end: date, chunk_days: int) -> List[Tuple[int, int]]:
+    """按天数切分日期区间"""
+    chunks = []
+    lo = start.toordinal()
+    hi = end.toordinal()
+    while lo <= hi:
+        chunks.append((lo, min(lo + chunk_days - 1, hi)))
+        lo += chunk_days
+    return chunks
+
+
+def run(candidate: str, reference: str = 'reference',
+        start: date = date(1900, 1, 1), end: date = date(2100, 12, 31),
+        processes: Optional[int] = None, chunk_days: int = 366,
+        liu_nian_span: int = 3, max_diffs: int = 10) -> dict:
+    """
+    在进程池中运行完整校验
+    返回: {'cases': 用例数, 'diffs': 前若干条差异, 'seconds': 耗时, 'rate': 每秒用例数}
+    """
+    # 提前加载一次，尽早暴露引擎配置错误
+    load_engine(reference)
+    load_engine(candidate)
+
+    tasks = [
+        (reference, candidate, lo, hi, liu_nian_span, max_diffs)
+        for lo, hi in split_range(start, end, chunk_days)
+    ]
+
+    began = time.perf_counter()
+    cases = 0
+    diffs = []
+    with Pool(processes) as pool:
+        for count, chunk_diffs in pool.imap(check_range, tasks):
+            cases += count
+            diffs.extend(chunk_diffs[:max(0, max_diffs - len(diffs))])
+    seconds = time.perf_counter() - began
+
+    return {
+        'cases': cases,
+        'diffs': diffs,
+        'seconds': seconds,
+        'rate': cases / seconds if seconds > 0 else 0.0,
+    }
+
+
+# ==================== 命令行 ====================
+
+def _parse_date(text: str) -> date:
+    return date.fromisoformat(text)
+
+
+def main(argv=None) -> int:
+    parser = argparse.ArgumentParser(description="对比候选引擎与参考实现的排盘结果")
+    parser.add_argument('candidate', help="候选引擎，格式 name 或 name:arg")
+    parser.add_argument('--reference', default='reference', help="参考引擎（默认 reference）")
+    parser.add_argument('--start', type=_parse_date, default=date(1900, 1, 1))
+    parser.add_argument('--end', type=_parse_date, default=date(2100, 12, 31))
+    parser.add_argument('--processes', type=int, default=None, help="进程数（默认CPU核数）")
+    parser.add_argument('--chunk-days', type=int, default=366, help="每个任务的天数")
+    parser.add_argument('--liu-nian', type=int, default=3, help="每个用例校验的流年数")
+    parser.add_argument('--max-diffs', type=int, default=10, help="最多显示的差异数")
+    args = parser.parse_args(argv)
+
+    for spec in (args.candidate, args.reference):
+        try:
+            load_engine(spec)
+        except ValueError as e:
+            parser.error(str(e))
+
+    report = run(args.candidate, args.reference, args.start, args.end,
+                 args.processes, args.chunk_days, args.liu_nian, args.max_diffs)
+
+    print(f"用例数: {report['cases']}")
+    print(f"耗时: {report['seconds']:.1f}秒 ({report['rate']:.0f} 用例/秒)")
+    if not report['diffs']:
+        print("✅ 全部一致")
+        return 0
+
+    print(f"❌ 发现差异（显示前{len(report['diffs'])}条）:")
+    for case, expected, actual in report['diffs']:
+        print(f"  输入: {case}")
+        print(f"    参考: {expected}")
+        print(f"    候选: {actual}")
+    return 1
+
+
+if __name__ == "__main__":
+    exit(main())